@@ -0,0 +1,262 @@
+"""
+Offline load test for /chat: no Groq, no Mongo server, no network.
+
+Run from backend/:
+    python -m benchmarks.chat --requests 200 --concurrency 16 --output chat-before.json
+    python -m benchmarks.chat --requests 200 --concurrency 16 --compare chat-before.json
+
+The agent runs against a scripted chat model that makes the same tool call a
+real model would for each scenario, so the measured time is the serving path
+itself: FastAPI, the agent graph, tools, Chroma, embeddings and Mongo (in-memory).
+The fast path and answer cache are off unless --keep-fast-paths is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# query -> (tool the scripted model calls, its arguments)
+SCENARIOS = {
+    "gainers": ("Who are the top 5 gainers today?", "get_top_gainers_losers", {"n": 5}),
+    "rag": ("What did Reliance announce regarding dividends?", "search_market_documents", {"symbol": "RELIANCE"}),
+    "prediction": ("Predict tomorrow's price for TCS.", "predict_stock_price", {}),
+}
+
+COMPANIES = {
+    "RELIANCE": "Reliance Industries Limited", "TCS": "Tata Consultancy Services Limited",
+    "HDFCBANK": "HDFC Bank Limited", "INFY": "Infosys Limited", "ICICIBANK": "ICICI Bank Limited",
+    "SBIN": "State Bank of India", "BHARTIARTL": "Bharti Airtel Limited", "ITC": "ITC Limited",
+    "LT": "Larsen & Toubro Limited", "WIPRO": "Wipro Limited",
+}
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the Groq model. The first turn calls the scenario's tool,
+    the turn after the tool result answers with it. Optional fixed latency per call.
+    """
+    latency_ms: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _reply(self, messages):
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            content = f"Based on the data: {str(last.content)[:300]}"
+            message = AIMessage(content=content)
+        else:
+            query = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+            _, tool, args = next((s for s in SCENARIOS.values() if s[0] == query), SCENARIOS["gainers"])
+            message = AIMessage(content="", tool_calls=[{"name": tool, "args": {"query": query, **args}, "id": f"call_{tool}"}])
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        message.usage_metadata = {"input_tokens": prompt_chars // 4, "output_tokens": len(message.content) // 4 + 10,
+                                  "total_tokens": prompt_chars // 4 + len(message.content) // 4 + 10}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        time.sleep(self.latency_ms / 1000)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._reply(messages)
+
+def configure(workdir, llm_latency_ms, fake_embeddings, keep_fast_paths):
+    """Points every store at in-memory / temp-dir stand-ins, then imports the app. Returns main."""
+    # Read at import time by the modules below
+    os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(workdir, "embedding_cache")
+    if not keep_fast_paths:
+        os.environ["FAST_PATH_ENABLED"] = "0"
+        os.environ["ANSWER_CACHE_SIZE"] = "0"
+    os.environ["INGESTION_INTERVAL_MINUTES"] = "0"
+
+    import mongomock
+    from src import agent, database, vector_store
+    database.client = mongomock.MongoClient()
+    database.db = database.client["nifty_bot_benchmark"]
+    vector_store.PERSIST_DIRECTORY = os.path.join(workdir, "chroma")
+    if fake_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        vector_store._embedding_function = DeterministicFakeEmbedding(size=384)
+    agent.get_agent_executor(llm=ScriptedChatModel(latency_ms=llm_latency_ms))
+
+    import main
+    return main
+
+def seed(symbols=50, history_days=60, announcements=200, seed_value=7):
+    """Synthetic Nifty-like market: daily history, latest snapshot, forecasts and RAG documents."""
+    from langchain_core.documents import Document
+    from src.database import save_market_stats, bump_snapshot_version
+    from src.forecasting import refresh_forecasts
+    from src.vector_store import add_documents, make_document_id, warmup_vector_store
+
+    rng = random.Random(seed_value)
+    names = list(COMPANIES) + [f"STOCK{i:02d}" for i in range(symbols - len(COMPANIES))]
+    prices = {s: rng.uniform(100, 4000) for s in names}
+    start = datetime.now() - timedelta(days=history_days)
+    for day in range(history_days):
+        timestamp = start + timedelta(days=day)
+        records = []
+        for s in names:
+            change = rng.gauss(0, 1.2)
+            prices[s] *= 1 + change / 100
+            records.append({
+                "SYMBOL": s, "COMPANY": COMPANIES.get(s, f"{s.title()} Limited"),
+                "OPEN": round(prices[s] * 0.995, 2), "HIGH": round(prices[s] * 1.01, 2), "LOW": round(prices[s] * 0.99, 2),
+                "LTP": round(prices[s], 2), "%CHNG": round(change, 2), "VOLUME": rng.randint(10**5, 10**7),
+                "DATE": timestamp.strftime("%Y-%m-%d"),
+            })
+        save_market_stats(records, timestamp)
+
+    docs, ids = [], []
+    for r in records:
+        docs.append(Document(
+            page_content=f"Stock Update: {r['SYMBOL']}. Current Price (LTP): {r['LTP']}. Percentage Change: {r['%CHNG']}%. Volume: {r['VOLUME']}.",
+            metadata={"source": "market_live", "type": "stock_price", "symbol": r["SYMBOL"], "company": r["COMPANY"],
+                      "date": r["DATE"], "day": int(r["DATE"].replace("-", ""))}))
+        ids.append(make_document_id("market_live", "stock_price", r["SYMBOL"], r["DATE"]))
+    topics = ["declared an interim dividend of Rs {n} per share", "board meeting to consider results on day {n}",
+              "allotted {n} lakh shares under ESOP", "credit rating reaffirmed, outlook stable ({n})"]
+    for i in range(announcements):
+        symbol = rng.choice(names)
+        docs.append(Document(
+            page_content=f"{COMPANIES.get(symbol, symbol)}: {rng.choice(topics).format(n=rng.randint(1, 40))}. Filing #{i}.",
+            metadata={"source": f"announcement_{i}.pdf", "type": "pdf", "symbol": symbol, "date": records[0]["DATE"]}))
+        ids.append(f"benchmark:announcement:{i}")
+    add_documents(docs, ids)
+    refresh_forecasts(bump_snapshot_version())
+    warmup_vector_store()
+
+def _reset_peak_rss():
+    """Starts a new peak-RSS window (Linux: writing 5 to clear_refs resets VmHWM). False where unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _rss_mb():
+    """Peak RSS since the last _reset_peak_rss(); elsewhere than Linux, since the process started."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)  # kB
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+async def run_scenario(client, endpoint, query, requests, concurrency, warmup):
+    for _ in range(warmup):
+        await client.post(endpoint, json={"query": query})
+    # Peak of this scenario only, not model loading, seeding or the scenarios before it
+    per_scenario = _reset_peak_rss()
+
+    latencies, errors = [], 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in pending:
+            t0 = time.perf_counter()
+            response = await client.post(endpoint, json={"query": query})
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if response.status_code != 200 or "event: error" in response.text:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": requests, "concurrency": concurrency, "errors": errors,
+        "throughput_rps": round(requests / wall, 1),
+        "mean_ms": round(statistics.mean(latencies), 1),
+        "p50_ms": round(cuts[49], 1), "p95_ms": round(cuts[94], 1), "p99_ms": round(cuts[98], 1),
+        "max_ms": round(max(latencies), 1),
+        "peak_rss_mb": _rss_mb(),
+        "peak_rss_scope": "scenario" if per_scenario else "process",
+    }
+
+async def run_benchmark(app, scenarios, endpoint, requests, concurrency, warmup):
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=300) as client:
+        return {name: await run_scenario(client, endpoint, SCENARIOS[name][0], requests, concurrency, warmup)
+                for name in scenarios}
+
+def print_report(results, baseline=None):
+    print(f"\n{'scenario':<12}{'rps':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'peak RSS MB':>13}")
+    for name, r in results["scenarios"].items():
+        print(f"{name:<12}{r['throughput_rps']:>8}{r['mean_ms']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}"
+              f"{r['errors']:>8}{r['peak_rss_mb']:>13}")
+        before = ((baseline or {}).get("scenarios") or {}).get(name)
+        if before:
+            deltas = [f"{key} {(r[key] - before[key]) / before[key] * 100:+.1f}%"
+                      for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb") if before.get(key)]
+            print(f"{'':<12}vs {baseline.get('git_commit') or 'baseline'}: {', '.join(deltas)}")
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline /chat load test with a scripted LLM.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of {list(SCENARIOS)}")
+    parser.add_argument("--endpoint", default="/chat", choices=["/chat", "/chat/stream"])
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests per scenario")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency per LLM call")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Hash-based embeddings instead of the sentence-transformers model")
+    parser.add_argument("--keep-fast-paths", action="store_true", help="Leave the fast path and answer cache enabled")
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--history-days", type=int, default=60)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    parser.add_argument("--compare", default=None, help="Earlier --output file to diff against")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {sorted(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="nifty_bench_chat_")
+    try:
+        main = configure(workdir, args.llm_latency_ms, args.fake_embeddings, args.keep_fast_paths)
+        seed(args.symbols, args.history_days)
+        scenario_results = asyncio.run(run_benchmark(main.app, scenarios, args.endpoint, args.requests, args.concurrency, args.warmup))
+        results = {"timestamp": datetime.now().isoformat(timespec="seconds"), "git_commit": _git_commit(),
+                   "config": vars(args), "scenarios": scenario_results}
+        baseline = None
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+        print_report(results, baseline)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,151 @@
+"""
+Embedding backend benchmark: throughput and retrieval agreement.
+
+Run from backend/:
+    python -m benchmarks.embeddings --backends huggingface onnx onnx-int8 --threads 4 --batch-size 64
+    python -m benchmarks.embeddings --backends huggingface remote --concurrency 16   # needs src.embedding_service running
+
+Embeds the same corpus with each backend and reports documents/sec, single-query latency and
+recall@k, i.e. the share of the reference backend's (the first one listed) top-k documents that a
+backend also ranks in its own top-k for the same queries. The corpus is the local Chroma collection
+unless --corpus is given (a text file with one document per blank-line separated paragraph).
+Queries/sec under concurrency is single-query embedding from --concurrency threads at once,
+as API workers embedding searches do.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+DEFAULT_QUERIES = [
+    "Who are the top gainers today?",
+    "What did Reliance announce regarding dividends?",
+    "Infosys quarterly results and revenue guidance",
+    "HDFC Bank board meeting outcome",
+    "Which stocks traded the most volume?",
+    "Nifty option chain put call ratio and max pain",
+    "TCS share buyback record date",
+    "Tata Motors intraday high and low",
+    "bonus issue or stock split announcement",
+    "credit rating upgrade for a Nifty 50 company",
+]
+
+def parse_backend(spec):
+    """'onnx-int8' -> ('onnx', 'int8'); 'huggingface' -> ('huggingface', 'none')."""
+    backend, _, quantize = spec.partition("-")
+    return backend, quantize or "none"
+
+def load_corpus(path, limit):
+    if path:
+        with open(path, encoding="utf-8") as f:
+            docs = [p.strip() for p in f.read().split("\n\n") if p.strip()]
+    else:
+        from src.vector_store import get_vector_store
+        docs = [d for d in get_vector_store().get(include=["documents"])["documents"] if d]
+    docs = list(dict.fromkeys(docs))
+    if not docs:
+        raise SystemExit("Empty corpus: run an ingestion first or pass --corpus.")
+    return docs[:limit]
+
+def load_queries(path, corpus, sample):
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    # Built-in questions plus the opening words of random documents (queries with a known answer)
+    rng = random.Random(0)
+    openings = [" ".join(doc.split()[:12]) for doc in rng.sample(corpus, min(sample, len(corpus)))]
+    return DEFAULT_QUERIES + openings
+
+def _normalized(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+def concurrent_qps(model, queries, concurrency, rounds=5):
+    """Queries/sec with `concurrency` threads each embedding one query at a time."""
+    work = queries * rounds
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        t0 = time.perf_counter()
+        list(pool.map(model.embed_query, work))
+        return len(work) / (time.perf_counter() - t0)
+
+def measure(spec, corpus, queries, threads, batch_size, runs, concurrency):
+    from src.embeddings import create_embeddings
+    backend, quantize = parse_backend(spec)
+    t0 = time.perf_counter()
+    model = create_embeddings(backend, quantize, threads=threads, batch_size=batch_size)
+    model.embed_query("warmup")
+    load_s = time.perf_counter() - t0
+
+    best = None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        doc_vectors = model.embed_documents(corpus)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    query_ms, query_vectors = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        query_vectors.append(model.embed_query(query))
+        query_ms.append((time.perf_counter() - t0) * 1000)
+    return {
+        "backend": spec, "load_s": round(load_s, 2), "docs_per_s": round(len(corpus) / best, 1),
+        "query_p50_ms": round(statistics.median(query_ms), 2),
+        "concurrent_qps": round(concurrent_qps(model, queries, concurrency), 1),
+        "docs": _normalized(doc_vectors), "queries": _normalized(query_vectors),
+    }
+
+def top_k(result, k):
+    scores = result["queries"] @ result["docs"].T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def compare(results, k):
+    """Adds recall@k and mean document-vector cosine against the first (reference) backend."""
+    reference = results[0]
+    expected = top_k(reference, k)
+    for result in results:
+        found = top_k(result, k)
+        result[f"recall@{k}"] = round(float(np.mean([len(set(a) & set(b)) / k for a, b in zip(expected, found)])), 4)
+        if result["docs"].shape == reference["docs"].shape:
+            result["cosine_vs_ref"] = round(float(np.mean(np.sum(result["docs"] * reference["docs"], axis=1))), 5)
+        else:
+            result["cosine_vs_ref"] = None  # different dimension, vectors not comparable
+        result["speedup"] = round(result["docs_per_s"] / reference["docs_per_s"], 2)
+
+def print_report(results, k, corpus_size, query_count, concurrency):
+    print(f"\n{corpus_size} documents, {query_count} queries, reference: {results[0]['backend']}")
+    qps = f"qps@{concurrency}"
+    print(f"{'backend':<20}{'load s':>8}{'docs/s':>10}{'speedup':>9}{'query p50 ms':>14}{qps:>10}{f'recall@{k}':>11}{'cos vs ref':>12}")
+    for r in results:
+        cosine = "-" if r["cosine_vs_ref"] is None else f"{r['cosine_vs_ref']:.5f}"
+        print(f"{r['backend']:<20}{r['load_s']:>8.2f}{r['docs_per_s']:>10.1f}{r['speedup']:>8.2f}x"
+              f"{r['query_p50_ms']:>14.2f}{r['concurrent_qps']:>10.1f}{r[f'recall@{k}']:>11.4f}{cosine:>12}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare embedding backends on throughput and retrieval recall.")
+    parser.add_argument("--backends", nargs="+", default=["huggingface", "onnx", "onnx-int8"],
+                        help="backend[-quantization]; the first one is the reference")
+    parser.add_argument("--corpus", help="Text file, documents separated by blank lines (default: the Chroma collection)")
+    parser.add_argument("--queries", help="Text file, one query per line (default: built-in + sampled)")
+    parser.add_argument("--limit", type=int, default=2000, help="Max documents embedded")
+    parser.add_argument("--sample-queries", type=int, default=40, help="Queries taken from document openings")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=0, help="0 = library default")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=3, help="Best of N passes over the corpus")
+    parser.add_argument("--concurrency", type=int, default=8, help="Threads for the concurrent query test")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.limit)
+    queries = load_queries(args.queries, corpus, args.sample_queries)
+    results = [measure(spec, corpus, queries, args.threads, args.batch_size, args.runs, args.concurrency)
+               for spec in args.backends]
+    compare(results, args.k)
+    print_report(results, args.k, len(corpus), len(queries), args.concurrency)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump([{key: v for key, v in r.items() if key not in ("docs", "queries")} for r in results], f, indent=2)
+        print(f"Saved to {args.output}")
@@ -0,0 +1,71 @@
+"""
+Import-time budget check for the API worker.
+
+Run from backend/ (exits non-zero when the budget is exceeded, so it can gate CI):
+    python -m benchmarks.import_time --budget-ms 1500
+tests/test_import_time.py enforces the same budget (IMPORT_TIME_BUDGET_MS) under pytest.
+
+Each run imports main.py in a fresh interpreter and fails if it takes longer than
+the budget or loads any module that should only be imported on first use.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Only needed by scraping, embedding or the agent; importing main must not load them
+DEFERRED_MODULES = [
+    "selenium", "webdriver_manager", "yfinance", "pandas", "fitz",
+    "langchain_huggingface", "sentence_transformers", "torch",
+    "langchain_chroma", "chromadb", "langchain_groq", "langchain.agents", "langgraph",
+]
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+elapsed = (time.perf_counter() - t0) * 1000
+print(json.dumps({"ms": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (DEFERRED_MODULES,)
+
+def measure(runs):
+    """Returns (best import time in ms, deferred modules that were loaded, slowest modules of the last run)."""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times, loaded, slowest = [], set(), []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=backend_dir,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing main failed:\n{result.stderr[-2000:]}")
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        times.append(probe["ms"])
+        loaded.update(probe["loaded"])
+        # -X importtime lines: "import time: self [us] | cumulative | package"
+        rows = []
+        for line in result.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[1].strip().isdigit():
+                rows.append((int(parts[1]), parts[2].rstrip()))
+        slowest = sorted(rows, reverse=True)[:10]
+    return min(times), sorted(loaded), slowest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if importing main.py is slower than the budget.")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=3, help="Best of N cold imports")
+    args = parser.parse_args()
+
+    best_ms, loaded, slowest = measure(args.runs)
+    print(f"import main: {best_ms:.0f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    print("Slowest imports (cumulative):")
+    for micros, name in slowest:
+        print(f"  {micros / 1000:8.1f} ms {name}")
+    failures = []
+    if best_ms > args.budget_ms:
+        failures.append(f"import time {best_ms:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    if loaded:
+        failures.append(f"deferred modules loaded at import: {', '.join(loaded)}")
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+    print("OK")
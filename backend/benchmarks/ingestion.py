@@ -0,0 +1,124 @@
+"""
+Offline end-to-end ingestion benchmark against the NSE replay server.
+
+Run from backend/:
+    python -m benchmarks.ingestion --fixtures ./fixtures/nse --runs 5 --latency-ms 150
+
+Reports wall time per stage (fetch, normalize, Mongo write, embed, Chroma upsert)
+and documents/sec. Chroma and the embedding cache are written to a temp dir; Mongo
+is an in-memory stand-in unless --mongo-uri is given. The cache starts empty, so only
+the first run (the warmup, by default) embeds everything; use --warmup 0 to time it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import httpx
+from benchmarks.nse_replay import start_replay_server
+
+STAGES = ["nse_fetch", "normalize", "fallback", "mongo_write", "embed", "vector_upsert", "pdf_ingest", "forecast"]
+
+def configure(base_url, chroma_dir, mongo_uri):
+    """Points the pipeline at the replay server, a temp Chroma dir and embedding cache, and a scratch Mongo DB."""
+    from src import database, scraper, vector_store
+    from src.embedding_cache import EmbeddingCache
+    from src.embeddings import embedding_id
+    from src.nse_client import NSESession
+
+    if mongo_uri:
+        from pymongo import MongoClient
+        database.client = MongoClient(mongo_uri)
+    else:
+        import mongomock
+        database.client = mongomock.MongoClient()
+    database.db = database.client["nifty_bot_benchmark"]
+    vector_store.PERSIST_DIRECTORY = chroma_dir
+    if vector_store.EMBEDDING_CACHE_ENABLED:
+        # Not the shared ./embedding_cache, which would turn the embed stage into pure cache hits
+        vector_store._embedding_cache = EmbeddingCache(embedding_id(), directory=os.path.join(chroma_dir, "embedding_cache"))
+
+    scraper.nse_session = NSESession(base_url)
+
+    def replay_fallback():
+        # Replays the recorded Yahoo Finance records instead of calling yfinance
+        response = httpx.get(f"{base_url}/fallback", timeout=30)
+        return response.json() if response.status_code == 200 else []
+    scraper.fetch_fallback_data = replay_fallback
+    return scraper
+
+async def run_once(scraper):
+    from src.jobs import IngestionJob
+    job = IngestionJob(trigger="benchmark")
+    job.start()
+    t0 = time.perf_counter()
+    await scraper.scrape_nse_data(job)
+    wall = time.perf_counter() - t0
+    stages = {s["name"]: s for s in job.stages}
+    docs = (stages.get("vector_upsert") or {}).get("records") or 0
+    return {"status": job.status, "wall_s": wall, "docs": docs,
+            "stages_ms": {name: s["duration_ms"] for name, s in stages.items()}}
+
+async def run_benchmark(scraper, runs, warmup):
+    from src.vector_store import warmup_vector_store
+    # Model load is a one-off cost, keep it out of the measured runs
+    await asyncio.to_thread(warmup_vector_store)
+    for _ in range(warmup):
+        await run_once(scraper)
+    return [await run_once(scraper) for _ in range(runs)]
+
+def summarize(results):
+    ok = [r for r in results if r["status"] == "success"]
+    summary = {"runs": len(results), "succeeded": len(ok), "stages": {}}
+    for name in STAGES:
+        values = [r["stages_ms"][name] for r in results if name in r["stages_ms"]]
+        if values:
+            summary["stages"][name] = {
+                "mean_ms": round(statistics.mean(values), 1),
+                "p50_ms": round(statistics.median(values), 1),
+                "max_ms": round(max(values), 1),
+                "runs": len(values),
+            }
+    walls = [r["wall_s"] for r in ok]
+    if walls:
+        summary["wall_mean_s"] = round(statistics.mean(walls), 3)
+        summary["docs_per_sec"] = round(sum(r["docs"] for r in ok) / sum(walls), 1)
+    return summary
+
+def print_report(summary):
+    print(f"\nRuns: {summary['runs']} (succeeded: {summary['succeeded']})")
+    print(f"{'stage':<15}{'mean ms':>10}{'p50 ms':>10}{'max ms':>10}{'runs':>6}")
+    for name, s in summary["stages"].items():
+        print(f"{name:<15}{s['mean_ms']:>10}{s['p50_ms']:>10}{s['max_ms']:>10}{s['runs']:>6}")
+    if "wall_mean_s" in summary:
+        print(f"Wall time per run: {summary['wall_mean_s']} s | Throughput: {summary['docs_per_sec']} docs/sec")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline ingestion benchmark.")
+    parser.add_argument("--fixtures", required=True, help="Directory of recorded NSE payloads")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured runs before timing")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--mongo-uri", default=None, help="Use a real Mongo instead of the in-memory stand-in")
+    parser.add_argument("--output", default=None, help="Write the summary as JSON")
+    args = parser.parse_args()
+
+    server, base_url = start_replay_server(args.fixtures, latency_ms=args.latency_ms,
+                                           jitter_ms=args.jitter_ms, failure_rate=args.failure_rate)
+    chroma_dir = tempfile.mkdtemp(prefix="nifty_bench_chroma_")
+    try:
+        scraper = configure(base_url, chroma_dir, args.mongo_uri)
+        results = asyncio.run(run_benchmark(scraper, args.runs, args.warmup))
+        summary = summarize(results)
+        print_report(summary)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(summary, f, indent=2)
+    finally:
+        server.shutdown()
+        shutil.rmtree(chroma_dir, ignore_errors=True)
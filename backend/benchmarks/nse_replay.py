@@ -0,0 +1,99 @@
+"""
+Local stand-in for nseindia.com that replays recorded API payloads.
+
+Record fixtures from a live run first. The backend records, so the variable goes on the server:
+    NSE_RECORD_DIR=./fixtures/nse python main.py
+    curl -X POST http://localhost:8000/run-ingestion
+
+Then serve them (run from backend/):
+    python -m benchmarks.nse_replay --fixtures ./fixtures/nse --latency-ms 150 --failure-rate 0.05
+and point the backend at it with NSE_BASE_URL=http://127.0.0.1:8765
+"""
+import argparse
+import glob
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from src.nse_client import ENDPOINTS
+
+def load_fixtures(fixture_dir):
+    """{name: cycle of payloads}, captures of the same endpoint replay in recording order."""
+    fixtures = {}
+    for name in list(ENDPOINTS) + ["fallback"]:
+        paths = sorted(glob.glob(os.path.join(fixture_dir, f"{name}-*.json")))
+        payloads = []
+        for path in paths:
+            with open(path) as f:
+                payloads.append(json.load(f))
+        if payloads:
+            fixtures[name] = itertools.cycle(payloads)
+    if not fixtures:
+        raise SystemExit(f"No fixtures found in {fixture_dir}")
+    return fixtures
+
+def make_handler(fixtures, latency_ms=0.0, jitter_ms=0.0, failure_rate=0.0):
+    routes = {api_path: name for name, (api_path, _) in ENDPOINTS.items()}
+    routes["/fallback"] = "fallback"
+    lock = threading.Lock()
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real site
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body=b"", content_type="application/json", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/":
+                # Home page hands out the session cookie, like NSE does for browsers
+                self._send(200, b"<html>NSE replay</html>", "text/html", {"Set-Cookie": "nsit=replay; Path=/"})
+                return
+            name = routes.get(self.path)
+            if name is None or name not in fixtures:
+                self._send(404, b'{"error": "no fixture"}')
+                return
+            time.sleep(max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000)
+            if random.random() < failure_rate:
+                self._send(503, b'{"error": "injected failure"}')
+                return
+            with lock:
+                payload = next(fixtures[name])
+            self._send(200, json.dumps(payload).encode())
+
+    return ReplayHandler
+
+def start_replay_server(fixture_dir, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0, failure_rate=0.0):
+    """Starts the server in a daemon thread. Returns (server, base_url)."""
+    handler = make_handler(load_fixtures(fixture_dir), latency_ms, jitter_ms, failure_rate)
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded NSE API payloads over HTTP.")
+    parser.add_argument("--fixtures", required=True, help="Directory written by NSE_RECORD_DIR")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean added latency per API call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Std-dev of the added latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of API calls answered with 503")
+    args = parser.parse_args()
+
+    server, base_url = start_replay_server(args.fixtures, args.host, args.port, args.latency_ms, args.jitter_ms, args.failure_rate)
+    print(f"Replaying NSE fixtures from {args.fixtures} at {base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,11 +1,90 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import importlib
+import json
+import os
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from src.agent import get_agent_executor
-from src.scraper import scrape_nse_data
-from src.models import QueryRequest, QueryResponse
+from fastapi.responses import StreamingResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from src.models import QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryResponse, BatchItemResponse
+from src.vector_store import warmup_vector_store, is_warm
+from src.database import get_snapshot_version
+from src.cache import answer_cache, normalize_query
+from src.batching import BatchContext, BATCH_MAX_QUERIES, BATCH_MAX_CONCURRENCY
+from src.prefetch import prefetching
+from src.fast_path import try_fast_path
+from src.jobs import IngestionJobRunner
+from src.market_feed import market_feed
+from src.database import get_ingestion_log
+from src.nse_client import nse_session
+from src.metrics import request_trace, MetricsCallbackHandler, render_metrics
 import uvicorn
 
-app = FastAPI(title="Nifty 50 RAG Bot")
+# LangGraph agent (compiled once, reused by every request). Built by the warmup task,
+# or by the first request if that comes sooner; importing it pulls in the langchain/Groq stack.
+agent_app = None
+session_agent_app = None   # same graph, with conversation history kept per session_id
+sessions = None            # src.sessions, loaded with the agent
+
+async def get_agent(session_id=None):
+    global agent_app, session_agent_app, sessions
+    if agent_app is None:
+        module = await asyncio.to_thread(importlib.import_module, "src.agent")
+        session_agent_app = await asyncio.to_thread(module.get_agent_executor, session=True)
+        sessions = importlib.import_module("src.sessions")
+        agent_app = module.get_agent_executor()
+    return session_agent_app if session_id else agent_app
+
+@asynccontextmanager
+async def session_turn(session_id):
+    """
+    Yields whether the session already has history. Turns of one session run one at a time,
+    so concurrent requests cannot interleave their messages.
+    """
+    if not session_id:
+        yield False
+        return
+    await get_agent()
+    async with sessions.session_lock(session_id):
+        yield sessions.checkpointer.has_thread(session_id)
+
+async def _warmup():
+    try:
+        await get_agent()
+        # Model loading is blocking, keep it off the event loop
+        await asyncio.to_thread(warmup_vector_store)
+    except Exception as e:
+        print(f"Warmup Error: {e}")
+
+async def run_ingestion(job):
+    # The scraper stack (pandas, PDF parsing, forecasting) loads on the first run, not at worker start
+    scraper = await asyncio.to_thread(importlib.import_module, "src.scraper")
+    await scraper.scrape_nse_data(job)
+    # Clients of this worker get the new prices now; other workers notice within MARKET_FEED_POLL_SECONDS
+    try:
+        await market_feed.refresh()
+    except Exception as e:
+        print(f"Market Feed Error: {e}")
+
+# Runs scrape_nse_data as a background job, one at a time
+ingestion_runner = IngestionJobRunner(run_ingestion)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the agent and load the embedding model + Chroma once per process, in the background
+    warmup_task = asyncio.create_task(_warmup())
+    scheduler_task = asyncio.create_task(ingestion_runner.run_scheduler())
+    feed_task = asyncio.create_task(market_feed.run())
+    yield
+    warmup_task.cancel()
+    scheduler_task.cancel()
+    feed_task.cancel()
+    await nse_session.aclose()
+
+app = FastAPI(title="Nifty 50 RAG Bot", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,29 +93,267 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-# Initialize LangGraph Agent
-agent_app = get_agent_executor()
+# Caps how many agent runs (LLM round trips + tools) are in flight per worker
+MAX_CONCURRENT_AGENT_RUNS = int(os.getenv("MAX_CONCURRENT_AGENT_RUNS", "8"))
+agent_semaphore = asyncio.Semaphore(MAX_CONCURRENT_AGENT_RUNS)
+
+# How many answers each path served (fast_path / cache / agent, plus batch duplicates and errors), to measure LLM offload
+served_by_counts = Counter()
+# Paths that answer without the LLM; "batch" duplicates reuse another answer and "error" answered nothing
+OFFLOAD_PATHS = ("fast_path", "cache")
+
+@app.get("/health")
+async def health():
+    """Reports whether the embedding model / vector store warmup has finished."""
+    return {"status": "ok" if is_warm() else "warming_up", "vector_store_ready": is_warm()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters of the answer cache."""
+    return answer_cache.stats()
+
+@app.get("/stats")
+async def stats():
+    """Share of answers served without an LLM call (batch duplicates and errors not counted)."""
+    offloaded = sum(served_by_counts[path] for path in OFFLOAD_PATHS)
+    total = offloaded + served_by_counts["agent"]
+    return {
+        "served_by": dict(served_by_counts),
+        "llm_offload_rate": round(offloaded / total, 4) if total else 0.0,
+    }
 
-@app.post("/run-ingestion")
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: request/stage latency histograms, tool and token counters."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+@app.post("/run-ingestion", status_code=202)
 async def run_pipeline():
-    """Trigger the scraping and ingestion pipeline manually."""
+    """Trigger the scraping and ingestion pipeline manually (runs in the background)."""
+    job, started = ingestion_runner.start(trigger="manual")
+    message = "Ingestion started." if started else "Ingestion already running."
+    return {"message": message, "job_id": job.id, "status": job.status, "status_url": f"/ingestion/{job.id}"}
+
+@app.get("/ingestion")
+async def list_ingestion_jobs():
+    """Recent ingestion jobs started by this worker."""
+    return ingestion_runner.recent()
+
+@app.get("/ingestion/{job_id}")
+async def ingestion_status(job_id: str):
+    """Progress and per-stage timings of one ingestion job."""
+    job = ingestion_runner.get(job_id)
+    if job is not None:
+        return job.to_dict()
+    # The job may have run in another worker, fall back to its log entry
+    log = await asyncio.to_thread(get_ingestion_log, job_id)
+    if log is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job '{job_id}'.")
+    return log
+
+def _answer_without_agent(query, use_cache=True):
+    """
+    Cheap paths tried before the agent: deterministic fast path, then the answer cache.
+    Returns (served_by, answer or None, snapshot version). Blocking: Mongo + optional embedding.
+    Follow-ups in a session depend on earlier turns, so those skip the cache (use_cache=False).
+    """
     try:
-        await scrape_nse_data()  # <--- CHANGED: Added 'await'
-        return {"message": "Pipeline executed successfully. Data updated."}
+        answer = try_fast_path(query)
+        if answer is not None:
+            return "fast_path", answer, None
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"Fast Path Error: {e}")
+    if not (answer_cache.enabled and use_cache):
+        return "agent", None, None
+    version = get_snapshot_version()
+    return "cache", answer_cache.get(query, version), version
 
 @app.post("/chat", response_model=QueryResponse)
 async def chat_endpoint(request: QueryRequest):
-    agent = get_agent_executor()
-    
-    # LangGraph requires input as a "messages" list
-    result = agent.invoke({"messages": [("user", request.query)]})
-    
-    # The final answer is the last message from the AI
-    final_answer = result["messages"][-1].content
-    
-    return QueryResponse(answer=final_answer)
+    session_id = request.session_id
+    with request_trace("/chat") as trace:
+        async with session_turn(session_id) as in_session:
+            served_by, answer, version = await asyncio.to_thread(_answer_without_agent, request.query, not in_session)
+            if answer is not None:
+                if session_id:
+                    await sessions.record_turn(await get_agent(session_id), session_id, request.query, answer)
+                served_by_counts[served_by] += 1
+                trace["served_by"] = served_by
+                return QueryResponse(answer=answer, served_by=served_by, session_id=session_id)
+
+            # LangGraph requires input as a "messages" list; with a session, only the new turn is sent
+            callback = MetricsCallbackHandler(trace)
+            agent = await get_agent(session_id)
+            config = sessions.session_config(session_id, callbacks=[callback]) if session_id else {"callbacks": [callback]}
+            # Optional: vector search and market snapshot start now, overlapping the first LLM call
+            with prefetching(request.query):
+                async with agent_semaphore:
+                    result = await agent.ainvoke({"messages": [("user", request.query)]}, config=config)
+            callback.finish()
+
+        # The final answer is the last message from the AI
+        final_answer = result["messages"][-1].content
+
+        if answer_cache.enabled and not in_session:
+            await asyncio.to_thread(answer_cache.put, request.query, version, final_answer)
+
+        served_by_counts["agent"] += 1
+        return QueryResponse(answer=final_answer, session_id=session_id)
+
+async def _answer_batch_item(query, limit):
+    """One question of a batch: the same paths as /chat, without a session. Errors stay with the item."""
+    async with limit:
+        t0 = time.perf_counter()
+        with request_trace("/chat/batch") as trace:
+            try:
+                served_by, answer, version = await asyncio.to_thread(_answer_without_agent, query)
+                if answer is None:
+                    served_by = "agent"
+                    callback = MetricsCallbackHandler(trace)
+                    agent = await get_agent()
+                    with prefetching(query):
+                        async with agent_semaphore:
+                            result = await agent.ainvoke({"messages": [("user", query)]}, config={"callbacks": [callback]})
+                    callback.finish()
+                    answer = result["messages"][-1].content
+                    if answer_cache.enabled:
+                        await asyncio.to_thread(answer_cache.put, query, version, answer)
+                item = BatchItemResponse(query=query, answer=answer, served_by=served_by, latency_ms=0)
+            except Exception as e:
+                served_by = "error"
+                item = BatchItemResponse(query=query, served_by=served_by, latency_ms=0, error=str(e))
+            trace["served_by"] = served_by
+            served_by_counts[served_by] += 1
+        item.latency_ms = round((time.perf_counter() - t0) * 1000, 1)
+        return item
+
+@app.post("/chat/batch", response_model=BatchQueryResponse)
+async def chat_batch_endpoint(request: BatchQueryRequest):
+    """
+    Answers a list of questions concurrently, in request order with per-item latency.
+    Repeated questions are answered once; across the others, query embeddings are
+    computed in shared model calls and identical tool calls run once.
+    """
+    if len(request.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUERIES} queries per batch.")
+    t0 = time.perf_counter()
+    first_index = {}   # normalized question -> index of its first occurrence
+    for i, query in enumerate(request.queries):
+        first_index.setdefault(normalize_query(query), i)
+    unique = sorted(first_index.values())
+
+    limit = asyncio.Semaphore(min(request.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    with BatchContext(request.queries[i] for i in unique) as batch:
+        answered = await asyncio.gather(*(_answer_batch_item(request.queries[i], limit) for i in unique))
+    by_index = dict(zip(unique, answered))
+
+    results = []
+    for i, query in enumerate(request.queries):
+        first = first_index[normalize_query(query)]
+        if first == i:
+            results.append(by_index[i])
+        else:
+            served_by_counts["batch"] += 1
+            results.append(by_index[first].model_copy(update={"query": query, "duplicate_of": first}))
+    shared = {**batch.stats, "duplicate_queries": len(request.queries) - len(unique)}
+    return BatchQueryResponse(results=results, latency_ms=round((time.perf_counter() - t0) * 1000, 1), shared=shared)
+
+def _sse(event, data):
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: QueryRequest):
+    """Streams LLM tokens and tool start/end events as Server-Sent Events."""
+    session_id = request.session_id
+
+    async def event_stream():
+        with request_trace("/chat/stream") as trace:
+            try:
+                async with session_turn(session_id) as in_session:
+                    served_by, answer, version = await asyncio.to_thread(_answer_without_agent, request.query, not in_session)
+                    if answer is not None:
+                        if session_id:
+                            await sessions.record_turn(await get_agent(session_id), session_id, request.query, answer)
+                        served_by_counts[served_by] += 1
+                        trace["served_by"] = served_by
+                        yield _sse("token", {"text": answer})
+                        yield _sse("done", {"served_by": served_by, "session_id": session_id})
+                        return
+
+                    # Tokens of the last LLM call (after the final tool) form the answer
+                    answer_tokens = []
+                    streamed = False   # whether the current LLM call sent any tokens
+                    callback = MetricsCallbackHandler(trace)
+                    agent = await get_agent(session_id)
+                    config = sessions.session_config(session_id, callbacks=[callback]) if session_id else {"callbacks": [callback]}
+                    with prefetching(request.query):
+                        async with agent_semaphore:
+                            inputs = {"messages": [("user", request.query)]}
+                            async for event in agent.astream_events(inputs, config=config, version="v2"):
+                                kind = event["event"]
+                                if kind == "on_chat_model_start":
+                                    streamed = False
+                                elif kind == "on_chat_model_stream":
+                                    token = event["data"]["chunk"].content
+                                    if token:
+                                        streamed = True
+                                        answer_tokens.append(token)
+                                        yield _sse("token", {"text": token})
+                                elif kind == "on_chat_model_end" and not streamed:
+                                    # Models/providers without token streaming: send the whole message at once
+                                    text = getattr(event["data"].get("output"), "content", "")
+                                    if text and isinstance(text, str):
+                                        answer_tokens.append(text)
+                                        yield _sse("token", {"text": text})
+                                elif kind == "on_tool_start":
+                                    answer_tokens = []
+                                    yield _sse("tool_start", {"tool": event["name"], "input": event["data"].get("input")})
+                                elif kind == "on_tool_end":
+                                    output = event["data"].get("output")
+                                    yield _sse("tool_end", {"tool": event["name"], "output": getattr(output, "content", output)})
+                    callback.finish()
+
+                    if answer_cache.enabled and not in_session:
+                        await asyncio.to_thread(answer_cache.put, request.query, version, "".join(answer_tokens))
+                    served_by_counts["agent"] += 1
+                    yield _sse("done", {"served_by": "agent", "session_id": session_id})
+            except Exception as e:
+                trace["served_by"] = "error"
+                yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/ws/market")
+async def market_websocket(websocket: WebSocket):
+    """
+    Live Nifty 50 table without an agent run: a "snapshot" message with every row on connect,
+    then "delta" messages with only the rows that changed after each ingestion.
+    """
+    await websocket.accept()
+    try:
+        queue = await market_feed.subscribe()
+    except Exception as e:
+        print(f"Market Feed Error: {e}")
+        await websocket.close(code=1011)
+        return
+
+    async def send_updates():
+        while True:
+            await websocket.send_text(await queue.get())
+
+    sender = asyncio.create_task(send_updates())
+    try:
+        # Clients send nothing; receiving is how a closed connection is noticed between ingestions
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        sender.cancel()
+        market_feed.unsubscribe(queue)
 
 # @app.post("/chat", response_model=QueryResponse)
 # async def chat(request: QueryRequest):
@@ -0,0 +1,6 @@
+# Settings are read with os.getenv at import time all over src/, so .env must be loaded before any
+# src module runs: a package's __init__ is imported first, whichever module (main, a benchmark,
+# python -m src.embedding_service) is the entry point.
+from dotenv import load_dotenv
+
+load_dotenv()
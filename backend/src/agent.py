@@ -69,12 +69,18 @@
 #     )
     
 #     return agent_executor
+import json
 import os
-from langchain_groq import ChatGroq
+import threading
 # from langgraph.prebuilt import create_react_agent
 from langchain.agents import create_agent
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import ToolMessage
 
-from src.tools import get_top_gainers_losers, predict_stock_price, search_market_documents
+from src.tools import get_top_gainers_losers, predict_stock_price, search_market_documents, get_stock_price_history, get_option_chain_analytics
+from src.sessions import checkpointer, compact_history
+from src.batching import current_batch
+from src.cache import normalize_query
 from langchain_core.tools import tool # Import generic @tool decorator
 from dotenv import load_dotenv
 
@@ -93,24 +99,78 @@ load_dotenv()
 #     # Format the documents into a string for the LLM
 #     return "\n\n".join([f"[Source: {d.metadata.get('source', 'Unknown')}] {d.page_content}" for d in docs])
 
-def get_agent_executor():
+SYSTEM_PROMPT = "You are a Nifty 50 Market Assistant. Use the available tools to answer financial queries. For 'gainers/losers', ALWAYS use the get_top_gainers_losers tool. For predictions, use the prediction tool. For price movement over a period, use get_stock_price_history. For option chain, PCR, max pain or open interest questions, use get_option_chain_analytics. Also use search_market_documents for answering queries; when the question is about specific stocks, pass their symbols as the symbol filter and keep k small."
+
+class SharedToolCalls(AgentMiddleware):
+    """
+    Inside /chat/batch, identical tool calls (same tool, same arguments up to case and punctuation)
+    run once and every question that made them gets the result. Outside a batch it does nothing.
+    """
+
+    @staticmethod
+    def _key(tool_call):
+        args = {k: normalize_query(v) if isinstance(v, str) else v for k, v in tool_call["args"].items()}
+        return tool_call["name"], json.dumps(args, sort_keys=True, default=str)
+
+    @staticmethod
+    def _for_caller(result, request):
+        # The shared message answers the first caller's tool call; re-address it
+        if isinstance(result, ToolMessage):
+            return result.model_copy(update={"tool_call_id": request.tool_call["id"]})
+        return result
+
+    def wrap_tool_call(self, request, handler):
+        batch = current_batch()
+        if batch is None:
+            return handler(request)
+        return self._for_caller(batch.share_call(self._key(request.tool_call), lambda: handler(request)), request)
+
+    async def awrap_tool_call(self, request, handler):
+        batch = current_batch()
+        if batch is None:
+            return await handler(request)
+        return self._for_caller(await batch.ashare_call(self._key(request.tool_call), lambda: handler(request)), request)
+
+# Compiled once and reused by every request: (stateless graph, graph that keeps session history)
+_agent_apps = None
+_lock = threading.Lock()
+
+def get_agent_executor(llm=None, session=False):
+    """
+    `llm` only applies to the first call (benchmarks pass a scripted model before main.py builds the agent).
+    session=True returns the checkpointed graph, which needs a thread_id (see src.sessions.session_config).
+    """
+    global _agent_apps
+    if _agent_apps is None:
+        with _lock:
+            if _agent_apps is None:
+                agent_app = build_agent_executor(llm)
+                # Same graph without the checkpointer, for one-off questions that have no session
+                _agent_apps = (agent_app.copy({"checkpointer": None}), agent_app)
+    return _agent_apps[session]
+
+def build_agent_executor(llm=None):
     # 1. Initialize Llama 3.3 70B via Groq
-    llm = ChatGroq(
-        temperature=0,
-        model_name="llama-3.3-70b-versatile",
-        # model_name="llama-3.1-8b-instant",
-        api_key=os.getenv("GROQ_API_KEY")
-    )
+    if llm is None:
+        from langchain_groq import ChatGroq
+        llm = ChatGroq(
+            temperature=0,
+            model_name="llama-3.3-70b-versatile",
+            # model_name="llama-3.1-8b-instant",
+            api_key=os.getenv("GROQ_API_KEY")
+        )
     
     # 2. Setup Tools (Use the manual tool created above)
-    tools = [search_market_documents, get_top_gainers_losers, predict_stock_price]
+    tools = [search_market_documents, get_top_gainers_losers, predict_stock_price, get_stock_price_history, get_option_chain_analytics]
     
-    # 3. Create Agent (LangGraph)
+    # 3. Create Agent (LangGraph). Conversation history lives in the bounded checkpointer and is
+    # compacted before every LLM call, so the prompt stays under SESSION_TOKEN_BUDGET
     agent_app = create_agent(
         model=llm, 
         tools=tools,
-        system_prompt="You are a Nifty 50 Market Assistant. Use the available tools to answer financial queries. For 'gainers/losers', ALWAYS use the get_top_gainers_losers tool. For predictions, use the prediction tool. Also use search_market_documents for answering queries"
+        system_prompt=SYSTEM_PROMPT,
+        middleware=[compact_history, SharedToolCalls()],
+        checkpointer=checkpointer,
     )
-    agent_app = create_agent(llm, tools)
     
     return agent_app
@@ -0,0 +1,109 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import Future
+
+# --- CONFIGURATION ---
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "100"))
+# Questions of one /chat/batch request answered at the same time (agent runs are also capped by MAX_CONCURRENT_AGENT_RUNS)
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+# How long a query embedding waits for others from the same batch before the model runs
+BATCH_EMBED_WINDOW_MS = float(os.getenv("BATCH_EMBED_WINDOW_MS", "10"))
+
+# Batch being answered; asyncio tasks and asyncio.to_thread inherit it, so tools see it too
+_current = contextvars.ContextVar("batch_context", default=None)
+
+def current_batch():
+    return _current.get()
+
+class BatchContext:
+    """
+    Work shared by the questions of one /chat/batch request. Use as a context manager.
+    Query embeddings requested within embed_window_ms of each other go through the model in one call
+    (the first call also embeds the batch's own questions, which agents often search for verbatim),
+    and identical tool calls run once with every caller getting the result.
+    """
+
+    def __init__(self, queries=(), embed_window_ms=BATCH_EMBED_WINDOW_MS):
+        self.embed_window = embed_window_ms / 1000
+        self.stats = {"embed_requests": 0, "embed_calls": 0, "texts_embedded": 0, "tool_calls": 0, "tool_calls_shared": 0}
+        self._seed = list(dict.fromkeys(queries))
+        self._lock = threading.Lock()
+        self._vectors = {}        # text -> Future of its embedding
+        self._pending = []
+        self._timer = None
+        self._tool_calls = {}     # key -> Future (tools run in worker threads)
+        self._async_tool_calls = {}
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+
+    def embed_query(self, text, embed_many):
+        """Blocking: returns the vector of text, embedded together with whatever else is pending."""
+        with self._lock:
+            self.stats["embed_requests"] += 1
+            future = self._vectors.get(text)
+            if future is None:
+                future = self._vectors[text] = Future()
+                self._pending.append(text)
+                if self._timer is None:
+                    self._timer = threading.Timer(self.embed_window, self._flush, args=(embed_many,))
+                    self._timer.daemon = True
+                    self._timer.start()
+        return future.result()
+
+    def _flush(self, embed_many):
+        with self._lock:
+            texts, self._pending, self._timer = self._pending, [], None
+            for text in self._seed:
+                if text not in self._vectors:
+                    self._vectors[text] = Future()
+                    texts.append(text)
+            self._seed = []
+        try:
+            vectors = embed_many(texts)
+        except Exception as e:
+            with self._lock:
+                for text in texts:
+                    # Not memoized, so a later request for the same text retries
+                    self._vectors.pop(text).set_exception(e)
+            return
+        with self._lock:
+            self.stats["embed_calls"] += 1
+            self.stats["texts_embedded"] += len(texts)
+        for text, vector in zip(texts, vectors):
+            self._vectors[text].set_result(vector)
+
+    def share_call(self, key, run):
+        """Runs run() once per key; concurrent and later callers with the same key get its result."""
+        with self._lock:
+            self.stats["tool_calls"] += 1
+            future = self._tool_calls.get(key)
+            owner = future is None
+            if owner:
+                future = self._tool_calls[key] = Future()
+            else:
+                self.stats["tool_calls_shared"] += 1
+        if owner:
+            try:
+                future.set_result(run())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    async def ashare_call(self, key, run):
+        """Async share_call: run is a coroutine function, awaited once per key."""
+        self.stats["tool_calls"] += 1
+        task = self._async_tool_calls.get(key)
+        if task is None:
+            task = self._async_tool_calls[key] = asyncio.ensure_future(run())
+        else:
+            self.stats["tool_calls_shared"] += 1
+        # shield: one question being cancelled must not cancel the call for the others
+        return await asyncio.shield(task)
@@ -0,0 +1,112 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# --- CONFIGURATION ---
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))          # 0 disables the cache
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "900"))
+# Cosine similarity above which a differently-worded query reuses a cached answer (0 = exact match only)
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+def normalize_query(query):
+    """'  Top 5 Gainers today?? ' -> 'top 5 gainers today'"""
+    query = re.sub(r"[^\w%&.\s-]", " ", query.lower())
+    return re.sub(r"\s+", " ", query).strip(" .")
+
+class AnswerCache:
+    """
+    LRU + TTL cache of final chat answers.
+    Entries are keyed on (snapshot version, normalized query), so an answer is
+    never served once ingestion has published newer data.
+    """
+
+    def __init__(self, max_size=ANSWER_CACHE_SIZE, ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                 similarity_threshold=ANSWER_CACHE_SIMILARITY):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (version, key) -> (answer, expires_at, vector)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def _embed(self, key):
+        if self.similarity_threshold <= 0:
+            return None
+        from src.vector_store import get_embedding_function
+        vector = np.asarray(get_embedding_function().embed_query(key), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def get(self, query, version):
+        if not self.enabled:
+            return None
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._entries.get((version, key))
+            if entry is not None:
+                self._entries.move_to_end((version, key))
+                self.hits += 1
+                return entry[0]
+            if self.similarity_threshold <= 0:
+                self.misses += 1
+                return None
+            candidates = [(k, e) for k, e in self._entries.items() if k[0] == version and e[2] is not None]
+
+        # Semantic match: compare against cached answers of the same snapshot only
+        if candidates:
+            vector = self._embed(key)
+            scores = np.stack([e[2] for _, e in candidates]) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity_threshold:
+                with self._lock:
+                    if candidates[best][0] in self._entries:
+                        self._entries.move_to_end(candidates[best][0])
+                    self.hits += 1
+                return candidates[best][1][0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, query, version, answer):
+        # An empty answer is a failure (e.g. nothing streamed), never something to serve again
+        if not self.enabled or not (answer or "").strip():
+            return
+        key = normalize_query(query)
+        vector = self._embed(key)
+        with self._lock:
+            self._entries[(version, key)] = (answer, time.monotonic() + self.ttl_seconds, vector)
+            self._entries.move_to_end((version, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drops every entry, called after ingestion publishes a new snapshot."""
+        with self._lock:
+            self._entries.clear()
+
+    def _evict_expired(self, now):
+        expired = [k for k, e in self._entries.items() if e[1] <= now]
+        for k in expired:
+            del self._entries[k]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+answer_cache = AnswerCache()
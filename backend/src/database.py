@@ -1,22 +1,286 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument, ASCENDING
+from pymongo.errors import CollectionInvalid, OperationFailure, DuplicateKeyError
 import os
-from dotenv import load_dotenv
+import threading
+import time
+from datetime import datetime, timedelta
+from src.metrics import instrumented
 
-load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("DB_NAME", "nifty_bot")
+# Other workers see a new snapshot version within this long (the worker that ingested sees it at once)
+SNAPSHOT_VERSION_TTL_SECONDS = float(os.getenv("SNAPSHOT_VERSION_TTL_SECONDS", "2"))
 
-client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
-db = client[os.getenv("DB_NAME", "nifty_bot")]
+# Created on first use, so importing this module never opens a connection
+# (benchmarks assign client/db directly to swap in mongomock)
+client = None
+db = None
+_db_lock = threading.Lock()
 
+def get_db():
+    global client, db
+    if db is None:
+        with _db_lock:
+            if db is None:
+                client = MongoClient(MONGO_URI)
+                db = client[DB_NAME]
+    return db
+
+@instrumented("mongo")
 def log_ingestion(data):
     """Log every pipeline run."""
-    db.ingestion_logs.insert_one(data)
+    get_db().ingestion_logs.insert_one(data)
+
+@instrumented("mongo")
+def get_ingestion_log(job_id):
+    return get_db().ingestion_logs.find_one({"job_id": job_id}, {"_id": 0})
+
+def acquire_ingestion_lock(owner, job_id, ttl_seconds):
+    """Lease-style lock shared by all workers; an expired lease can be taken over."""
+    now = datetime.now()
+    try:
+        get_db().meta.update_one(
+            {"_id": "ingestion_lock", "$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "job_id": job_id, "expires_at": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        # The lock document exists and is held by someone else
+        return False
+
+def renew_ingestion_lock(owner, ttl_seconds):
+    """Extends a held lease; False if it expired and another worker took it over."""
+    result = get_db().meta.update_one(
+        {"_id": "ingestion_lock", "owner": owner},
+        {"$set": {"expires_at": datetime.now() + timedelta(seconds=ttl_seconds)}},
+    )
+    return result.matched_count == 1
+
+def release_ingestion_lock(owner):
+    get_db().meta.delete_one({"_id": "ingestion_lock", "owner": owner})
+
+_collections_ready = False
+
+def ensure_collections():
+    """Creates the time-bucketed history collection and indexes once per process."""
+    global _collections_ready
+    if _collections_ready:
+        return
+    try:
+        # Mongo time-series collections bucket samples per symbol internally
+        get_db().create_collection(
+            "market_history",
+            timeseries={"timeField": "timestamp", "metaField": "symbol", "granularity": "minutes"},
+        )
+    except CollectionInvalid:
+        pass  # already exists
+    except (OperationFailure, NotImplementedError) as e:
+        # Mongo < 5.0 (and in-memory stand-ins) have no time-series support, a plain collection + index works the same
+        print(f"Time-series collection unavailable ({e}), using a regular collection.")
+    get_db().market_history.create_index([("symbol", ASCENDING), ("timestamp", ASCENDING)])
+    get_db().market_stats.create_index([("snapshot", ASCENDING)])
+    get_db().option_chain.create_index([("symbol", ASCENDING), ("as_of", ASCENDING)])
+    get_db().option_chain_analytics.create_index([("symbol", ASCENDING), ("as_of", ASCENDING)])
+    get_db().forecasts.create_index([("version", ASCENDING)])
+    get_db().ingested_files.create_index([("files.path", ASCENDING)])
+    get_db().ingested_files.create_index([("path", ASCENDING)])  # records from before "files"
+    _collections_ready = True
 
-def save_market_stats(data_list):
-    """Save structured market data (gainers/losers) for math queries."""
-    # Clear old daily stats to keep 'today' fresh
-    db.market_stats.delete_many({})
-    if data_list:
-        db.market_stats.insert_many(data_list)
+def _to_float(value):
+    try:
+        return float(str(value).replace(',', ''))
+    except (TypeError, ValueError):
+        return None
 
+@instrumented("mongo")
+def save_market_stats(data_list, timestamp=None):
+    """
+    Save structured market data (gainers/losers) for math queries.
+    Every scrape is appended to market_history; market_stats holds versioned
+    snapshots and readers follow the 'latest_market_stats' pointer, which is
+    switched with a single write only after the new snapshot is fully inserted.
+    """
+    if not data_list:
+        return None
+    ensure_collections()
+    timestamp = timestamp or datetime.now()
+
+    snapshot = get_db().meta.find_one_and_update(
+        {"_id": "market_stats_seq"}, {"$inc": {"seq": 1}},
+        upsert=True, return_document=ReturnDocument.AFTER,
+    )["seq"]
+    get_db().market_stats.insert_many([{**r, "snapshot": snapshot} for r in data_list])
+
+    get_db().market_history.insert_many([{
+        "symbol": r.get("SYMBOL"),
+        "timestamp": timestamp,
+        "date": r.get("DATE"),
+        "open": _to_float(r.get("OPEN")),
+        "high": _to_float(r.get("HIGH")),
+        "low": _to_float(r.get("LOW")),
+        "ltp": _to_float(r.get("LTP")),
+        "pchange": _to_float(r.get("%CHNG")),
+        "volume": _to_float(r.get("VOLUME")),
+    } for r in data_list if r.get("SYMBOL")])
+
+    # Atomic swap: readers see either the old or the new table, never a partial one
+    get_db().meta.update_one(
+        {"_id": "latest_market_stats"},
+        {"$set": {"snapshot": snapshot, "updated_at": timestamp}},
+        upsert=True,
+    )
+    # Keep the previous snapshot for readers that resolved the old pointer a moment ago
+    get_db().market_stats.delete_many({"$or": [{"snapshot": {"$lt": snapshot - 1}}, {"snapshot": {"$exists": False}}]})
+    return snapshot
+
+@instrumented("mongo")
 def get_market_stats():
-    return list(db.market_stats.find({}, {"_id": 0}))
\ No newline at end of file
+    pointer = get_db().meta.find_one({"_id": "latest_market_stats"})
+    if pointer is None:
+        # Data written before versioned snapshots existed
+        return list(get_db().market_stats.find({}, {"_id": 0}))
+    return list(get_db().market_stats.find({"snapshot": pointer["snapshot"]}, {"_id": 0, "snapshot": 0}))
+
+@instrumented("mongo")
+def save_option_chain(analytics, rows):
+    """Stores the full chain (one row per strike/expiry) and its precomputed analytics."""
+    ensure_collections()
+    as_of = datetime.now()
+    if rows:
+        get_db().option_chain.insert_many([{**r, "symbol": analytics["symbol"], "as_of": as_of} for r in rows])
+    # Analytics are written last, readers only ever look at the newest analytics document
+    get_db().option_chain_analytics.insert_one({**analytics, "as_of": as_of})
+    get_db().option_chain.delete_many({"symbol": analytics["symbol"], "as_of": {"$lt": as_of}})
+
+@instrumented("mongo")
+def get_option_chain_analytics(symbol="NIFTY"):
+    return get_db().option_chain_analytics.find_one({"symbol": symbol}, {"_id": 0}, sort=[("as_of", -1)])
+
+@instrumented("mongo")
+def get_price_history(symbol, days=30):
+    """All stored samples for one symbol over the last `days`, oldest first (served by the symbol+timestamp index)."""
+    since = datetime.now() - timedelta(days=days)
+    return list(get_db().market_history.find(
+        {"symbol": symbol, "timestamp": {"$gte": since}},
+        {"_id": 0},
+    ).sort("timestamp", ASCENDING))
+
+@instrumented("mongo")
+def get_daily_history(days=365):
+    """Last sample of each (symbol, trading day) for every symbol, oldest first. One aggregation for the whole index."""
+    since = datetime.now() - timedelta(days=days)
+    rows = get_db().market_history.aggregate([
+        {"$match": {"timestamp": {"$gte": since}, "ltp": {"$ne": None}}},
+        {"$sort": {"timestamp": ASCENDING}},
+        {"$group": {
+            "_id": {"symbol": "$symbol", "date": "$date"},
+            "close": {"$last": "$ltp"},
+            "volume": {"$last": "$volume"},
+            "timestamp": {"$last": "$timestamp"},
+        }},
+        {"$sort": {"timestamp": ASCENDING}},
+    ])
+    return [{"symbol": r["_id"]["symbol"], "date": r["_id"]["date"] or r["timestamp"].strftime("%Y-%m-%d"),
+             "close": r["close"], "volume": r["volume"]} for r in rows]
+
+@instrumented("mongo")
+def save_forecasts(version, forecasts):
+    """Stores one forecast per symbol tagged with the snapshot version it was computed from."""
+    ensure_collections()
+    if forecasts:
+        get_db().forecasts.insert_many([{**f, "version": version} for f in forecasts])
+    get_db().forecasts.delete_many({"version": {"$lt": version}})
+    # Recorded even when nothing could be forecast, so readers know this version is done
+    get_db().meta.update_one({"_id": "forecasts_version"}, {"$set": {"version": version}}, upsert=True)
+
+@instrumented("mongo")
+def get_forecasts():
+    """All forecasts of the newest computed version as (version, [forecast]), (0, []) if none were computed yet."""
+    done = get_db().meta.find_one({"_id": "forecasts_version"})
+    if done is None:
+        # Forecasts stored before the version was recorded separately
+        latest = get_db().forecasts.find_one({}, {"version": 1}, sort=[("version", -1)])
+        done = latest or {"version": 0}
+    return done["version"], list(get_db().forecasts.find({"version": done["version"]}, {"_id": 0}))
+
+@instrumented("mongo")
+def get_ingested_files(paths):
+    """
+    {path: {"_id": content hash, "size", "mtime"}} for files already ingested under these paths
+    (used to skip unchanged files without hashing).
+    """
+    paths = list(paths)
+    wanted = set(paths)
+    known = {}
+    for r in get_db().ingested_files.find({"$or": [{"files.path": {"$in": paths}}, {"path": {"$in": paths}}]}):
+        # Records written before "files" existed hold a single top-level path
+        files = r.get("files") or ([{"path": r["path"], "size": r.get("size"), "mtime": r.get("mtime")}] if r.get("path") else [])
+        for f in files:
+            if f["path"] in wanted:
+                known[f["path"]] = {"_id": r["_id"], "size": f.get("size"), "mtime": f.get("mtime")}
+    return known
+
+@instrumented("mongo")
+def is_content_ingested(content_hash):
+    return get_db().ingested_files.count_documents({"_id": content_hash}, limit=1) > 0
+
+@instrumented("mongo")
+def mark_file_ingested(content_hash, path, size, mtime, chunks=None, error=None):
+    """
+    One record per distinct file content, listing every path that holds it (copies and renames add a path).
+    The path is taken off the record of the content it held before; records no path holds any more are
+    deleted and their hashes returned, so the caller deletes their chunks too.
+    """
+    files = get_db().ingested_files
+    orphaned = []
+    for record in files.find({"_id": {"$ne": content_hash}, "$or": [{"files.path": path}, {"path": path}]}, {"_id": 1}):
+        files.update_one({"_id": record["_id"]},
+                         {"$pull": {"files": {"path": path}}, "$unset": {"path": "", "size": "", "mtime": ""}})
+        if files.delete_one({"_id": record["_id"], "files.0": {"$exists": False}}).deleted_count:
+            orphaned.append(record["_id"])
+
+    update = {"seen_at": datetime.now()}
+    if chunks is not None:
+        update.update({"chunks": chunks, "error": error, "ingested_at": datetime.now()})
+    files.update_one({"_id": content_hash}, {"$pull": {"files": {"path": path}}})
+    files.update_one(
+        {"_id": content_hash},
+        {"$set": update, "$unset": {"path": "", "size": "", "mtime": ""},
+         "$push": {"files": {"path": path, "size": size, "mtime": mtime}}},
+        upsert=True,
+    )
+    return orphaned
+
+_snapshot_version = (None, 0.0)  # (version, monotonic time it was read)
+
+@instrumented("mongo")
+def _read_snapshot_version():
+    doc = get_db().meta.find_one({"_id": "snapshot_version"})
+    return doc["version"] if doc else 0
+
+def get_snapshot_version(max_age=SNAPSHOT_VERSION_TTL_SECONDS):
+    """
+    Version of the latest successfully ingested data, 0 before the first run.
+    Checked on every lookup of snapshot-derived data, so Mongo is read at most once per max_age.
+    """
+    global _snapshot_version
+    version, read_at = _snapshot_version
+    if version is None or time.monotonic() - read_at >= max_age:
+        version = _read_snapshot_version()
+        _snapshot_version = (version, time.monotonic())
+    return version
+
+@instrumented("mongo")
+def bump_snapshot_version():
+    """Called after each successful ingestion so anything derived from older data is invalidated."""
+    global _snapshot_version
+    doc = get_db().meta.find_one_and_update(
+        {"_id": "snapshot_version"},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    # This worker switches to the new version now rather than after the TTL
+    _snapshot_version = (doc["version"], time.monotonic())
+    return doc["version"]
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+# --- CONFIGURATION ---
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")  # float16 halves disk/RAM, float32 is exact
+KEY_SIZE = 20  # SHA-1 digest bytes
+
+def content_key(text):
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock across processes (the API workers and an ingestion may write the same cache)."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class EmbeddingCache:
+    """
+    Append-only on-disk cache of document embeddings for one embedding model.
+
+    <dir>/<model>.keys  concatenated 20-byte SHA-1 digests of page_content
+    <dir>/<model>.vec   matching vectors as a raw float16/float32 matrix (memory-mapped)
+    <dir>/<model>.json  dimension and dtype
+
+    Row i of the vector file belongs to key i. Vectors are appended before their keys, under a
+    file lock, and a writer first truncates vector rows left without a key (a crash between the
+    two writes), so later rows cannot shift onto the wrong key.
+    """
+
+    def __init__(self, model_name, directory=EMBEDDING_CACHE_DIR, dtype=EMBEDDING_CACHE_DTYPE):
+        slug = re.sub(r"[^\w.-]+", "_", model_name)
+        os.makedirs(directory, exist_ok=True)
+        self.keys_path = os.path.join(directory, f"{slug}.keys")
+        self.vectors_path = os.path.join(directory, f"{slug}.vec")
+        self.meta_path = os.path.join(directory, f"{slug}.json")
+        self.lock_path = os.path.join(directory, f"{slug}.lock")
+        self.dtype = np.dtype(dtype)
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+        self._rows = {}          # digest -> row
+        self._count = 0          # rows known to this process
+        self._keys_offset = 0    # bytes of the keys file already read
+        self._matrix = None
+        self._lock = threading.Lock()
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            self.dim, self.dtype = meta["dim"], np.dtype(meta["dtype"])
+
+    def _refresh(self):
+        """Picks up rows appended since the last read (possibly by another process)."""
+        if not os.path.exists(self.keys_path) or self.dim is None:
+            return
+        size = os.path.getsize(self.keys_path)
+        if size <= self._keys_offset:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read(size - self._keys_offset)
+        usable = len(data) - len(data) % KEY_SIZE
+        for i in range(0, usable, KEY_SIZE):
+            self._rows.setdefault(data[i:i + KEY_SIZE], self._count)
+            self._count += 1
+        self._keys_offset += usable
+        self._matrix = None  # remap on next read
+
+    def _vectors(self):
+        if self._matrix is None and self._count:
+            self._matrix = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(self._count, self.dim))
+        return self._matrix
+
+    def get_many(self, texts):
+        """Returns a list aligned with texts: float32 vector for hits, None for misses."""
+        with self._lock:
+            self._refresh()
+            keys = [content_key(t) for t in texts]
+            rows = [self._rows.get(k) for k in keys]
+            matrix = self._vectors() if any(r is not None for r in rows) else None
+            result = [None if r is None else np.asarray(matrix[r], dtype=np.float32) for r in rows]
+            hits = sum(r is not None for r in rows)
+            self.hits += hits
+            self.misses += len(rows) - hits
+            return result
+
+    def put_many(self, texts, vectors):
+        if not texts:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock, _file_lock(self.lock_path):
+            self._refresh()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w") as f:
+                    json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+            new = {}
+            for text, vector in zip(texts, vectors):
+                key = content_key(text)
+                if key not in self._rows and key not in new:
+                    new[key] = vector
+            if not new:
+                return
+            self._drop_orphan_rows()
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(list(new.values())).astype(self.dtype).tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(new.keys()))
+            self._refresh()
+
+    def _drop_orphan_rows(self):
+        """Cuts the vector file back to one row per key. Caller holds the file lock."""
+        expected = self._count * self.dim * self.dtype.itemsize
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) > expected:
+            self._matrix = None  # no mapping of the old size may outlive the truncation
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(expected)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
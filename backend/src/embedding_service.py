@@ -0,0 +1,145 @@
+"""
+Shared embedding service for multi-worker deployments.
+
+One process holds the only copy of the embedding model and answers every API worker
+(EMBEDDING_BACKEND=remote), gathering concurrent requests into micro-batches.
+
+Run from backend/ before starting the workers (listens on EMBEDDING_SERVICE_URL, the same setting clients use):
+    python -m src.embedding_service
+    python -m src.embedding_service --url http://127.0.0.1:8100 --backend onnx --quantize int8
+"""
+import argparse
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+import numpy as np
+from fastapi import FastAPI
+from fastapi.responses import Response
+from pydantic import BaseModel
+from src.embeddings import (EMBEDDING_BACKEND, EMBEDDING_QUANTIZE, EMBEDDING_THREADS, EMBED_BATCH_SIZE, EMBEDDING_SERVICE_URL,
+                            create_embeddings, embedding_id)
+
+# --- CONFIGURATION ---
+# How long the first request of a batch waits for others
+EMBEDDING_SERVICE_WINDOW_MS = float(os.getenv("EMBEDDING_SERVICE_WINDOW_MS", "5"))
+# Texts per model call; a batch closes early once it has this many
+EMBEDDING_SERVICE_MAX_BATCH = int(os.getenv("EMBEDDING_SERVICE_MAX_BATCH", str(EMBED_BATCH_SIZE)))
+
+class EmbedRequest(BaseModel):
+    texts: list[str]
+
+class MicroBatcher:
+    """
+    Queues embed requests and runs them through the model together.
+    The first request waits up to window_ms for company; requests arriving while the model
+    is busy form the next batch, so batches grow with load instead of queueing one by one.
+    """
+
+    def __init__(self, model, window_ms=EMBEDDING_SERVICE_WINDOW_MS, max_batch=EMBEDDING_SERVICE_MAX_BATCH):
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.stats = {"requests": 0, "texts": 0, "batches": 0, "model_seconds": 0.0}
+        self._queue = asyncio.Queue()
+
+    async def embed(self, texts):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _next_batch(self):
+        items = [await self._queue.get()]
+        size = len(items[0][0])
+        deadline = asyncio.get_running_loop().time() + self.window
+        while size < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    async def run(self):
+        while True:
+            items = await self._next_batch()
+            texts = [text for request_texts, _ in items for text in request_texts]
+            t0 = time.perf_counter()
+            try:
+                # One model call at a time: it already uses every core
+                vectors = np.asarray(await asyncio.to_thread(self.model.embed_documents, texts), dtype=np.float32)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats["model_seconds"] += time.perf_counter() - t0
+            self.stats["requests"] += len(items)
+            self.stats["texts"] += len(texts)
+            self.stats["batches"] += 1
+            start = 0
+            for request_texts, future in items:
+                if not future.done():  # the caller may have disconnected
+                    future.set_result(vectors[start:start + len(request_texts)])
+                start += len(request_texts)
+
+def create_app(backend, quantize, threads):
+    state = {}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # The model loads before the socket accepts requests
+        model = await asyncio.to_thread(create_embeddings, backend, quantize, threads)
+        state["dim"] = len(await asyncio.to_thread(model.embed_query, "warmup"))
+        state["embedding_id"] = embedding_id(backend, quantize)
+        state["batcher"] = MicroBatcher(model)
+        task = asyncio.create_task(state["batcher"].run())
+        print(f"Embedding service ready: {state['embedding_id']} ({state['dim']} dims).")
+        yield
+        task.cancel()
+
+    app = FastAPI(title="Nifty 50 Embedding Service", lifespan=lifespan)
+
+    @app.get("/health")
+    async def health():
+        stats = state["batcher"].stats
+        return {
+            "embedding_id": state["embedding_id"], "dim": state["dim"], **stats,
+            "mean_batch_texts": round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0,
+        }
+
+    @app.post("/embed")
+    async def embed(request: EmbedRequest):
+        """Returns the vectors as raw little-endian float32 rows; the dimension is in X-Embedding-Dim."""
+        vectors = await state["batcher"].embed(request.texts) if request.texts else np.zeros((0, state["dim"]), np.float32)
+        return Response(vectors.astype("<f4").tobytes(), media_type="application/octet-stream",
+                        headers={"X-Embedding-Dim": str(state["dim"])})
+
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the embedding model to every API worker.")
+    parser.add_argument("--url", default=EMBEDDING_SERVICE_URL, help="unix:///path/to.sock or http://host:port")
+    # Workers run with EMBEDDING_BACKEND=remote; the service itself needs a real backend
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND if EMBEDDING_BACKEND != "remote" else "huggingface",
+                        choices=["huggingface", "onnx"])
+    parser.add_argument("--quantize", default=EMBEDDING_QUANTIZE, choices=["none", "int8"])
+    parser.add_argument("--threads", type=int, default=EMBEDDING_THREADS)
+    args = parser.parse_args()
+
+    app = create_app(args.backend, args.quantize, args.threads)
+    if args.url.startswith("unix://"):
+        uvicorn.run(app, uds=args.url[len("unix://"):])
+    else:
+        url = urlparse(args.url)
+        uvicorn.run(app, host=url.hostname or "127.0.0.1", port=url.port or 8100)
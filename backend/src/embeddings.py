@@ -0,0 +1,201 @@
+import os
+import re
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# --- CONFIGURATION ---
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+# "huggingface" (sentence-transformers on PyTorch), "onnx" (ONNX Runtime, no PyTorch)
+# or "remote" (the shared embedding service, see src/embedding_service.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface")
+# "int8" quantizes the ONNX model's weights (dynamic quantization); "none" keeps float32
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "none")
+# Intra-op threads for the model (0 = library default, all cores)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+# Texts per model call
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Where quantized ONNX models are written
+EMBEDDING_MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR", "./embedding_models")
+# Directory with model.onnx + tokenizer.json for offline servers; otherwise both come from the Hugging Face Hub
+EMBEDDING_ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH", "")
+# Where the embedding service listens: unix:///path/to.sock or http://host:port
+EMBEDDING_SERVICE_URL = os.getenv("EMBEDDING_SERVICE_URL", "unix:///tmp/nifty-embeddings.sock")
+EMBEDDING_SERVICE_TIMEOUT = float(os.getenv("EMBEDDING_SERVICE_TIMEOUT", "30"))
+# all-MiniLM-L6-v2 truncates inputs to 256 word pieces in sentence-transformers as well
+MAX_SEQ_LENGTH = 256
+
+BACKENDS = ("huggingface", "onnx", "remote")
+QUANTIZATIONS = ("none", "int8")
+
+def _slug(name):
+    return re.sub(r"[^\w.-]+", "_", name)
+
+def embedding_id(backend=EMBEDDING_BACKEND, quantize=EMBEDDING_QUANTIZE, model_name=EMBEDDING_MODEL_NAME):
+    """
+    Names the vectors a configuration produces; the embedding cache is keyed on it.
+    The PyTorch backend keeps the bare model name, so caches written before backends existed stay valid.
+    """
+    if backend == "huggingface":
+        return model_name
+    if backend == "remote":
+        # The service decides what model runs, so its vectors are cached under the service's id
+        return get_remote_embeddings().embedding_id
+    return f"{model_name}.{backend}" + ("" if quantize == "none" else f"-{quantize}")
+
+def create_embeddings(backend=EMBEDDING_BACKEND, quantize=EMBEDDING_QUANTIZE, threads=EMBEDDING_THREADS,
+                      batch_size=EMBED_BATCH_SIZE, model_name=EMBEDDING_MODEL_NAME):
+    """Builds the LangChain Embeddings object for a backend. Heavy imports happen here, on first use."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {BACKENDS}.")
+    if quantize not in QUANTIZATIONS:
+        raise ValueError(f"Unknown EMBEDDING_QUANTIZE '{quantize}', expected one of {QUANTIZATIONS}.")
+    if backend == "onnx":
+        return OnnxEmbeddings(model_name, quantize=quantize, threads=threads, batch_size=batch_size)
+    if backend == "remote":
+        return get_remote_embeddings()
+
+    if quantize != "none":
+        raise ValueError("EMBEDDING_QUANTIZE=int8 needs EMBEDDING_BACKEND=onnx.")
+    # sentence-transformers pulls in torch, which only workers that embed need
+    from langchain_huggingface import HuggingFaceEmbeddings
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    # Use a standard, efficient open-source embedding model running locally
+    return HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"batch_size": batch_size})
+
+def _onnx_files(model_name):
+    """(model.onnx, tokenizer.json) paths, downloaded once into the Hugging Face cache unless EMBEDDING_ONNX_PATH is set."""
+    if EMBEDDING_ONNX_PATH:
+        return os.path.join(EMBEDDING_ONNX_PATH, "model.onnx"), os.path.join(EMBEDDING_ONNX_PATH, "tokenizer.json")
+    from huggingface_hub import hf_hub_download
+    repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    return hf_hub_download(repo, "onnx/model.onnx"), hf_hub_download(repo, "tokenizer.json")
+
+def _quantized(model_path, model_name):
+    """int8 copy of the model, made once and reused (redone if the source model is newer)."""
+    target = os.path.join(EMBEDDING_MODEL_DIR, _slug(model_name), "model.int8.onnx")
+    if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(model_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Written aside and renamed, so a worker never loads a half-written model
+        partial = f"{target}.{os.getpid()}.partial"
+        quantize_dynamic(model_path, partial, weight_type=QuantType.QInt8)
+        os.replace(partial, target)
+        print(f"Quantized {model_name} to int8: {target}")
+    return target
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence-transformers model run with ONNX Runtime: the transformer graph, then the
+    model's mean pooling and L2 normalization in NumPy. Vectors match the PyTorch backend
+    up to float error (float32) or closely (int8); benchmarks/embeddings.py measures by how much.
+    Texts are batched by length so short chunks are not padded to the longest one.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME, quantize="none", threads=0, batch_size=EMBED_BATCH_SIZE,
+                 max_length=MAX_SEQ_LENGTH):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path, tokenizer_path = _onnx_files(model_name)
+        if quantize == "int8":
+            model_path = _quantized(model_path, model_name)
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length)
+        # Pad to the longest text of each batch, with the model's own pad token
+        padding = self.tokenizer.padding or {}
+        self.tokenizer.enable_padding(pad_id=padding.get("pad_id", 0), pad_token=padding.get("pad_token", "[PAD]"))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        outputs = [o.name for o in self.session.get_outputs()]
+        self.output_name = "last_hidden_state" if "last_hidden_state" in outputs else outputs[0]
+        self.batch_size = batch_size
+
+    def _embed(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {"input_ids": np.array([e.ids for e in encodings], dtype=np.int64), "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run([self.output_name], feed)[0]  # (texts, tokens, dim)
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        vectors = [None] * len(texts)
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed([text])[0].tolist()
+
+class RemoteEmbeddings(Embeddings):
+    """
+    Thin client of the embedding service: no model in this process, every call is one request.
+    Safe to share between threads; the service batches concurrent requests from all workers.
+    """
+
+    def __init__(self, url=EMBEDDING_SERVICE_URL, timeout=EMBEDDING_SERVICE_TIMEOUT):
+        import httpx
+        if url.startswith("unix://"):
+            self.client = httpx.Client(transport=httpx.HTTPTransport(uds=url[len("unix://"):]),
+                                       base_url="http://embeddings", timeout=timeout)
+        else:
+            self.client = httpx.Client(base_url=url, timeout=timeout)
+        self.url = url
+        self._info = None
+
+    def info(self):
+        """The service's /health: embedding_id, dim and batching stats (cached after the first call)."""
+        if self._info is None:
+            self._info = self._request("GET", "/health").json()
+        return self._info
+
+    @property
+    def embedding_id(self):
+        return self.info()["embedding_id"]
+
+    def _request(self, method, path, **kwargs):
+        import httpx
+        try:
+            response = self.client.request(method, path, **kwargs)
+            response.raise_for_status()
+            return response
+        except httpx.TransportError as e:
+            raise RuntimeError(f"Embedding service unreachable at {self.url} "
+                               f"(start it with: python -m src.embedding_service): {e}") from e
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        response = self._request("POST", "/embed", json={"texts": list(texts)})
+        # Raw float32 rows: a fraction of the size and parse time of JSON numbers
+        dim = int(response.headers["X-Embedding-Dim"])
+        return np.frombuffer(response.content, dtype=np.float32).reshape(-1, dim).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+_remote = None
+_remote_lock = threading.Lock()
+
+def get_remote_embeddings():
+    """One client (and connection pool) per process."""
+    global _remote
+    if _remote is None:
+        with _remote_lock:
+            if _remote is None:
+                _remote = RemoteEmbeddings()
+    return _remote
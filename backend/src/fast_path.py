@@ -0,0 +1,190 @@
+import os
+import re
+import threading
+from src.market_snapshot import get_market_snapshot, INDEX_SYMBOLS
+
+# --- CONFIGURATION ---
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1") == "1"
+
+# Common names people use that are not derivable from the NSE company name
+EXTRA_ALIASES = {
+    "reliance": "RELIANCE",
+    "infosys": "INFY",
+    "hdfc bank": "HDFCBANK",
+    "icici bank": "ICICIBANK",
+    "kotak bank": "KOTAKBANK",
+    "sbi": "SBIN",
+    "state bank": "SBIN",
+    "airtel": "BHARTIARTL",
+    "bharti airtel": "BHARTIARTL",
+    "l&t": "LT",
+    "larsen": "LT",
+    "hul": "HINDUNILVR",
+    "hindustan unilever": "HINDUNILVR",
+    "maruti": "MARUTI",
+    "bajaj finance": "BAJFINANCE",
+    "asian paints": "ASIANPAINT",
+    "tata motors": "TATAMOTORS",
+    "tata steel": "TATASTEEL",
+    "tcs": "TCS",
+    "tech mahindra": "TECHM",
+    "coal india": "COALINDIA",
+    "power grid": "POWERGRID",
+    "sbi life": "SBILIFE",
+    "nifty": "NIFTY 50",
+}
+
+# First words of company names that are ordinary or sector words ("tech stocks", "oil prices"),
+# never used as an alias on their own
+GENERIC_WORDS = frozenset({
+    "tech", "coal", "power", "oil", "gas", "steel", "bank", "state", "life", "india", "indian",
+    "bharat", "hindustan", "national", "united", "general", "asian", "auto", "motors", "energy",
+    "finance", "financial", "capital", "insurance", "cement", "paints", "pharma", "industries",
+})
+
+# Anything that needs reasoning, history, news or a forecast goes to the agent
+DISQUALIFIERS = re.compile(
+    r"\b(predict\w*|forecast\w*|tomorrow|next|will|should|why|news|announce\w*|dividend\w*|"
+    r"option\w*|history|historical|week\w*|month\w*|year\w*|days|compare\w*|vs|versus|buy|sell|"
+    r"explain|analy\w*|trend\w*|"
+    # Past or other-than-today prices: the snapshot only has today's quote
+    r"yesterday|last(?! traded)|ago|previous|prev|earlier|ever|all time|record|closing|close|"
+    r"high\w*|low\w*|target\w*|sector\w*|"
+    r"jan|january|feb|february|mar|march|apr|april|jun|june|jul|july|aug|august|sept?|september|"
+    r"oct|october|nov|november|dec|december|"
+    r"\d{1,2}(?:st|nd|rd|th)|(?:19|20)\d\d|\d{1,2} \d{1,2} \d{2,4}|\d{1,2} may|may \d{1,2})\b"
+)
+# Gainers/losers within a group ("among bank stocks", "IT gainers") are not the index-wide list
+MOVER_QUALIFIERS = re.compile(
+    r"\b(among|within|stocks? in|banks?|banking|financials?|it (?:stocks?|companies|gainers|losers)|tech\w*|"
+    r"pharma\w*|auto\w*|fmcg|metals?|energy|oil|psu|infra\w*|cement|realty|midcap|smallcap)\b"
+)
+PRICE_INTENT = re.compile(r"\b(price|ltp|quote|trading at|share price|stock price|how much is|cmp)\b")
+GAINER_INTENT = re.compile(r"\b(gainers?|top performers?|best perform\w*|biggest risers?)\b")
+LOSER_INTENT = re.compile(r"\b(losers?|worst perform\w*|biggest fallers?|top decliners?)\b")
+TOP_N = re.compile(r"\b(?:top|best|worst|bottom)\s+(\d{1,2})\b")
+
+def _normalize(text):
+    return " " + re.sub(r"[^\w&]+", " ", text.lower()).strip() + " "
+
+def _to_float(value):
+    try:
+        return float(str(value).replace(',', ''))
+    except (TypeError, ValueError):
+        return None
+
+class SymbolIndex:
+    """Symbol / company-name dictionary built from one market snapshot."""
+
+    def __init__(self, records, version=None):
+        self.version = version
+        self.records = {r['SYMBOL']: r for r in records if r.get('SYMBOL')}
+        self.aliases = {}
+        first_words = {}
+        for symbol, r in self.records.items():
+            self.aliases[symbol.lower()] = symbol
+            company = _normalize(r.get('COMPANY') or "").strip()
+            if company:
+                self.aliases[company] = symbol
+                short = re.sub(r"\b(limited|ltd|corporation|company|co)\b", "", company).strip()
+                if short:
+                    self.aliases[short] = symbol
+                first_words.setdefault(company.split()[0], set()).add(symbol)
+        # "Wipro", "Cipla": a unique first word of the company name is a safe alias, unless it is a common word
+        for word, symbols in first_words.items():
+            if len(symbols) == 1 and len(word) >= 4 and word not in GENERIC_WORDS:
+                self.aliases.setdefault(word, next(iter(symbols)))
+        for alias, symbol in EXTRA_ALIASES.items():
+            if symbol in self.records:
+                self.aliases.setdefault(alias, symbol)
+        # Longest aliases first so "hdfc bank" wins over "hdfc"
+        self._ordered = sorted(self.aliases, key=len, reverse=True)
+
+    def match(self, query):
+        """Returns the distinct symbols mentioned in the query."""
+        text = _normalize(query)
+        found = []
+        for alias in self._ordered:
+            needle = f" {_normalize(alias).strip()} "
+            if needle in text:
+                found.append(self.aliases[alias])
+                text = text.replace(needle, " ")
+        return list(dict.fromkeys(found))
+
+_lock = threading.Lock()
+_index = None
+
+def get_symbol_index(snapshot=None):
+    """Rebuilt only when ingestion publishes a new snapshot version."""
+    global _index
+    if snapshot is None:
+        snapshot = get_market_snapshot()
+    if _index is None or _index.version != snapshot.version:
+        with _lock:
+            if _index is None or _index.version != snapshot.version:
+                _index = SymbolIndex(snapshot.records, snapshot.version)
+    return _index
+
+def _format_price(r):
+    ltp = _to_float(r.get('LTP'))
+    chng = _to_float(r.get('%CHNG'))
+    name = f"{r['SYMBOL']} ({r['COMPANY']})" if r.get('COMPANY') else r['SYMBOL']
+    text = f"{name} is trading at ₹{ltp:,.2f}" if ltp is not None else f"{name}: price not available"
+    if chng is not None:
+        text += f", {chng:+.2f}% today"
+    details = [f"{label} {_to_float(r.get(key)):,.2f}" for label, key in (("Open", "OPEN"), ("High", "HIGH"), ("Low", "LOW"))
+               if _to_float(r.get(key)) is not None]
+    if _to_float(r.get('VOLUME')) is not None:
+        details.append(f"Volume {int(_to_float(r['VOLUME'])):,}")
+    if details:
+        text += f" ({', '.join(details)})"
+    if r.get('DATE'):
+        text += f". Data as of {r['DATE']}"
+    return text + "."
+
+def _format_movers(snapshot, n, gainers, losers):
+    parts = []
+    if gainers:
+        parts.append(f"Top {n} Gainers: " + ", ".join(f"{s} ({c:+.2f}%)" for s, c in snapshot.top_k("change", n)))
+    if losers:
+        parts.append(f"Top {n} Losers: " + ", ".join(f"{s} ({c:+.2f}%)" for s, c in snapshot.top_k("change", n, largest=False)))
+    return "\n".join(parts)
+
+def try_fast_path(query):
+    """
+    Answers simple price and gainers/losers questions straight from the market snapshot.
+    Returns None whenever the query is not classified confidently, so the agent handles it.
+    """
+    if not FAST_PATH_ENABLED:
+        return None
+    text = _normalize(query)
+    if DISQUALIFIERS.search(text):
+        return None
+
+    wants_gainers = bool(GAINER_INTENT.search(text))
+    wants_losers = bool(LOSER_INTENT.search(text))
+    wants_price = bool(PRICE_INTENT.search(text))
+    if not (wants_gainers or wants_losers or wants_price):
+        return None
+
+    snapshot = get_market_snapshot()
+    if not len(snapshot):
+        return None
+    index = get_symbol_index(snapshot)
+    symbols = index.match(query)
+
+    if (wants_gainers or wants_losers) and not wants_price:
+        # "Is INFY among the top gainers?" needs reasoning, leave it to the agent
+        if [s for s in symbols if s not in INDEX_SYMBOLS]:
+            return None
+        if MOVER_QUALIFIERS.search(text):
+            return None
+        n = int(TOP_N.search(text).group(1)) if TOP_N.search(text) else 5
+        if not 1 <= n <= 25:
+            return None
+        return _format_movers(snapshot, n, wants_gainers, wants_losers)
+
+    if wants_price and not (wants_gainers or wants_losers) and len(symbols) == 1:
+        return _format_price(index.records[symbols[0]])
+
+    return None
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from src.database import get_daily_history, save_forecasts, get_forecasts, get_snapshot_version
+
+# --- CONFIGURATION ---
+FORECAST_LOOKBACK_DAYS = int(os.getenv("FORECAST_LOOKBACK_DAYS", "365"))
+# Below this many usable training days a symbol gets a random-walk forecast
+FORECAST_MIN_HISTORY_DAYS = int(os.getenv("FORECAST_MIN_HISTORY_DAYS", "30"))
+FORECAST_RIDGE = float(os.getenv("FORECAST_RIDGE", "1.0"))
+MOMENTUM_WINDOW = 5
+VOLATILITY_WINDOW = 10
+VOLUME_WINDOW = 20
+Z_95 = 1.96
+# While the forecasts for a new snapshot are still being computed, Mongo is re-checked this often
+FORECAST_RELOAD_SECONDS = 5
+
+def _ffill(values):
+    """Forward-fills NaNs along each row (days without a scrape keep the previous close)."""
+    idx = np.where(~np.isnan(values), np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return values[np.arange(values.shape[0])[:, None], idx]
+
+@contextmanager
+def _quiet():
+    """nanmean/nanstd warn on all-NaN windows, which are expected for symbols with short history."""
+    with warnings.catch_warnings(), np.errstate(all="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        yield
+
+def _rolling(values, window, fn):
+    """fn over trailing windows along axis 1, NaN until the window is full. Same shape as values."""
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        with _quiet():
+            out[:, window - 1:] = fn(sliding_window_view(values, window, axis=1), axis=-1)
+    return out
+
+def build_panel(history):
+    """[{symbol, date, close, volume}] -> (symbols, dates, closes[S, D], volumes[S, D])."""
+    symbols = sorted({r["symbol"] for r in history if r.get("symbol")})
+    dates = sorted({r["date"] for r in history})
+    s_pos = {s: i for i, s in enumerate(symbols)}
+    d_pos = {d: i for i, d in enumerate(dates)}
+    closes = np.full((len(symbols), len(dates)), np.nan)
+    volumes = np.full((len(symbols), len(dates)), np.nan)
+    for r in history:
+        if r.get("symbol") in s_pos and r.get("close"):
+            i, j = s_pos[r["symbol"]], d_pos[r["date"]]
+            closes[i, j] = r["close"]
+            volumes[i, j] = r["volume"] if r.get("volume") is not None else np.nan
+    return symbols, dates, closes, volumes
+
+def compute_features(closes, volumes):
+    """
+    Feature tensor [S, D-1, F] over daily log returns, all symbols at once:
+    last return, mean return over MOMENTUM_WINDOW, return std over VOLATILITY_WINDOW,
+    and the volume z-score against the trailing VOLUME_WINDOW days.
+    """
+    log_close = np.log(_ffill(closes))
+    returns = np.diff(log_close, axis=1)                          # [S, D-1], returns[:, t] = day t -> t+1
+    momentum = _rolling(returns, MOMENTUM_WINDOW, np.nanmean)
+    volatility = _rolling(returns, VOLATILITY_WINDOW, np.nanstd)
+    vol = volumes[:, 1:]
+    vol_mean = _rolling(vol, VOLUME_WINDOW, np.nanmean)
+    vol_std = _rolling(vol, VOLUME_WINDOW, np.nanstd)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volume_z = np.where(vol_std > 0, (vol - vol_mean) / vol_std, 0.0)
+    return returns, np.stack([returns, momentum, volatility, volume_z], axis=-1)
+
+def fit_batched_ridge(X, y, mask, ridge=FORECAST_RIDGE):
+    """
+    One ridge regression per symbol, solved together through batched normal equations.
+    X: [S, T, F] (standardized, intercept added here), y: [S, T], mask: [S, T] usable rows.
+    Returns (coefficients [S, F+1], residual std [S], samples [S]).
+    """
+    S, T, F = X.shape
+    Xb = np.concatenate([np.ones((S, T, 1)), X], axis=-1) * mask[..., None]
+    yb = np.where(mask, y, 0.0)
+    penalty = ridge * np.eye(F + 1)
+    penalty[0, 0] = 1e-8  # leave the intercept (drift) unpenalized
+    XtX = np.einsum("stf,stg->sfg", Xb, Xb) + penalty
+    Xty = np.einsum("stf,st->sf", Xb, yb)
+    beta = np.linalg.solve(XtX, Xty[..., None])[..., 0]
+    residuals = (yb - np.einsum("stf,sf->st", Xb, beta)) * mask
+    samples = mask.sum(axis=1)
+    dof = np.maximum(samples - (F + 1), 1)
+    return beta, np.sqrt((residuals ** 2).sum(axis=1) / dof), samples
+
+def _last_close_forecasts(symbols, as_of, closes):
+    """A single trading day has no returns to learn from: the forecast is the last close, unchanged."""
+    return [{
+        "symbol": symbol, "as_of": as_of, "last_close": round(float(close), 2),
+        "expected_return_pct": 0.0, "predicted_close": round(float(close), 2), "ci_low": None, "ci_high": None,
+        "direction": "sideways", "model": "last_close", "training_days": 0,
+        "volatility_pct": None, "momentum_pct": 0.0, "volume_z": 0.0,
+    } for symbol, close in zip(symbols, closes) if not np.isnan(close)]
+
+def compute_forecasts(history):
+    """
+    Next-trading-day forecast for every symbol in the history.
+    Features at day t predict the return from t to t+1; the latest features give tomorrow's move.
+    """
+    symbols, dates, closes, volumes = build_panel(history)
+    if not dates:
+        return []
+    if len(dates) < 2:
+        return _last_close_forecasts(symbols, dates[-1], closes[:, -1])
+    returns, features = compute_features(closes, volumes)
+
+    # Training pairs: features at t -> return at t+1
+    X, y = features[:, :-1], returns[:, 1:]
+    mask = np.isfinite(X).all(axis=-1) & np.isfinite(y)
+    with _quiet():
+        mean = np.nanmean(np.where(mask[..., None], X, np.nan), axis=1, keepdims=True)
+        std = np.nanstd(np.where(mask[..., None], X, np.nan), axis=1, keepdims=True)
+    mean, std = np.nan_to_num(mean), np.where(np.nan_to_num(std) > 0, std, 1.0)
+    X = np.nan_to_num((X - mean) / std)
+
+    beta, sigma, samples = fit_batched_ridge(X, np.nan_to_num(y), mask)
+    latest = np.nan_to_num((features[:, -1] - mean[:, 0]) / std[:, 0])
+    predicted = beta[:, 0] + np.einsum("sf,sf->s", latest, beta[:, 1:])
+
+    # Not enough history: random walk with the observed volatility
+    with _quiet():
+        realized = np.nanstd(returns, axis=1)
+    fitted = samples >= FORECAST_MIN_HISTORY_DAYS
+    predicted = np.where(fitted, predicted, 0.0)
+    sigma = np.where(fitted, sigma, realized)
+
+    last_close = _ffill(closes)[:, -1]
+    forecasts = []
+    for i, symbol in enumerate(symbols):
+        if np.isnan(last_close[i]):
+            continue
+        mu = float(predicted[i])
+        sd = float(sigma[i]) if np.isfinite(sigma[i]) else None
+        band = Z_95 * sd if sd is not None else None
+        if sd is None or abs(mu) < 0.25 * sd:
+            direction = "sideways"
+        else:
+            direction = "up" if mu > 0 else "down"
+        forecasts.append({
+            "symbol": symbol,
+            "as_of": dates[-1],
+            "last_close": round(float(last_close[i]), 2),
+            "expected_return_pct": round(float(np.expm1(mu)) * 100, 3),
+            "predicted_close": round(float(last_close[i] * np.exp(mu)), 2),
+            "ci_low": round(float(last_close[i] * np.exp(mu - band)), 2) if band is not None else None,
+            "ci_high": round(float(last_close[i] * np.exp(mu + band)), 2) if band is not None else None,
+            "direction": direction,
+            "model": "ridge" if fitted[i] else "random_walk",
+            "training_days": int(samples[i]),
+            "volatility_pct": round(sd * 100, 3) if sd is not None else None,
+            "momentum_pct": round(float(np.nan_to_num(features[i, -1, 1])) * 100, 3),
+            "volume_z": round(float(np.nan_to_num(features[i, -1, 3])), 2),
+        })
+    return forecasts
+
+def refresh_forecasts(version):
+    """Runs after each ingestion: one batched fit over the whole index, stored under `version`."""
+    forecasts = compute_forecasts(get_daily_history(FORECAST_LOOKBACK_DAYS))
+    save_forecasts(version, forecasts)
+    print(f"Forecasts computed for {len(forecasts)} symbols (snapshot v{version}).")
+    return len(forecasts)
+
+_lock = threading.Lock()
+_forecasts = {}
+_loaded_for = None   # snapshot version the cached forecasts are current for
+_retry_at = 0.0
+
+def get_forecast(symbol):
+    """
+    Cached forecast for one symbol, a dict lookup. Mongo is read once per published snapshot
+    (every FORECAST_RELOAD_SECONDS while that snapshot's forecasts are still being computed).
+    """
+    global _forecasts, _loaded_for, _retry_at
+    snapshot_version = get_snapshot_version()
+    if _loaded_for != snapshot_version and time.monotonic() >= _retry_at:
+        with _lock:
+            if _loaded_for != snapshot_version and time.monotonic() >= _retry_at:
+                version, rows = get_forecasts()
+                _forecasts = {f["symbol"]: f for f in rows}
+                if version >= snapshot_version:
+                    _loaded_for = snapshot_version
+                else:
+                    _retry_at = time.monotonic() + FORECAST_RELOAD_SECONDS
+    return _forecasts.get(symbol)
+
+def format_forecast(f):
+    ci = f" (95% interval {f['ci_low']:,} - {f['ci_high']:,})" if f.get("ci_low") is not None else ""
+    if f["model"] == "last_close":
+        return (
+            f"{f['symbol']}: last close {f['last_close']:,} on {f['as_of']}. Only one trading day of prices is stored "
+            f"so far, so there is no trend to extrapolate: the best estimate for the next session is the last close."
+        )
+    basis = (f"ridge model on {f['training_days']} days of returns, momentum and volume"
+             if f["model"] == "ridge" else f"random walk, only {f['training_days']} usable days of history")
+    volatility = f"Daily volatility {f['volatility_pct']}%, " if f.get("volatility_pct") is not None else ""
+    return (
+        f"{f['symbol']}: last close {f['last_close']:,} on {f['as_of']}. Next session forecast {f['direction']}, "
+        f"expected {f['expected_return_pct']:+.2f}% to {f['predicted_close']:,}{ci}. "
+        f"{volatility}{MOMENTUM_WINDOW}-day momentum {f['momentum_pct']:+.2f}%/day, "
+        f"volume z-score {f['volume_z']} [{basis}]."
+    )
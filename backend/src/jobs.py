@@ -0,0 +1,180 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, time as dtime
+from zoneinfo import ZoneInfo
+from src.database import acquire_ingestion_lock, release_ingestion_lock, renew_ingestion_lock
+from src.metrics import INGESTION_STAGE_SECONDS
+
+# --- CONFIGURATION ---
+INGESTION_INTERVAL_MINUTES = int(os.getenv("INGESTION_INTERVAL_MINUTES", "0"))  # 0 disables the scheduler
+MARKET_TIMEZONE = ZoneInfo("Asia/Kolkata")
+MARKET_OPEN = dtime.fromisoformat(os.getenv("MARKET_OPEN", "09:15"))
+MARKET_CLOSE = dtime.fromisoformat(os.getenv("MARKET_CLOSE", "15:30"))
+# A crashed worker's lock expires after this long; a running job renews it at each stage and every third of it
+INGESTION_LOCK_TTL_SECONDS = int(os.getenv("INGESTION_LOCK_TTL_SECONDS", "900"))
+JOB_HISTORY_SIZE = 50
+
+def is_market_open(now=None):
+    """NSE cash market hours, Monday to Friday (exchange holidays are not modelled)."""
+    now = now or datetime.now(MARKET_TIMEZONE)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() <= MARKET_CLOSE
+
+class IngestionJob:
+    """One ingestion run with per-stage timings and record counts."""
+
+    def __init__(self, trigger="manual"):
+        self.id = uuid.uuid4().hex[:12]
+        self.trigger = trigger
+        self.status = "queued"
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.stages = []
+        self._t0 = None
+        self.on_stage = None  # set by the runner: renews the ingestion lease
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times one pipeline stage. Set stage["records"] inside the block to record its output size.
+            with job.stage("market_stats") as stage:
+                stage["records"] = len(records)
+        """
+        stage = {"name": name, "status": "running", "started_at": datetime.now(), "duration_ms": None, "records": None}
+        self.stages.append(stage)
+        if self.on_stage is not None:
+            self.on_stage()
+        t0 = time.perf_counter()
+        try:
+            yield stage
+            stage["status"] = "done"
+        except Exception:
+            stage["status"] = "failed"
+            raise
+        finally:
+            stage["duration_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            INGESTION_STAGE_SECONDS.labels(name, stage["status"]).observe(stage["duration_ms"] / 1000)
+
+    def start(self):
+        self.status = "running"
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+
+    def finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.finished_at = datetime.now()
+
+    @property
+    def duration_ms(self):
+        if self._t0 is None:
+            return None
+        end = self.finished_at
+        elapsed = time.perf_counter() - self._t0 if end is None else (end - self.started_at).total_seconds()
+        return round(elapsed * 1000, 1)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "trigger": self.trigger,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_ms": self.duration_ms,
+            "current_stage": next((s["name"] for s in self.stages if s["status"] == "running"), None),
+            "stages": [dict(s) for s in self.stages],
+        }
+
+class IngestionJobRunner:
+    """
+    Runs the ingestion pipeline as a background task off the request path.
+    Only one run at a time: an in-process asyncio lock plus a Mongo lease so
+    several uvicorn workers never scrape concurrently.
+    """
+
+    def __init__(self, target):
+        self.target = target  # async def target(job)
+        self.current = None
+        self._jobs = OrderedDict()
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._tasks = set()
+
+    def start(self, trigger="manual"):
+        """Returns (job, started). If a run is already in progress, returns that job and False."""
+        if self.current is not None and self.current.status in ("queued", "running"):
+            return self.current, False
+        job = IngestionJob(trigger)
+        self.current = job
+        self._jobs[job.id] = job
+        while len(self._jobs) > JOB_HISTORY_SIZE:
+            self._jobs.popitem(last=False)
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job, True
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def recent(self):
+        return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    async def _keep_lease(self, job, renew_now):
+        """Renews the lease when a stage starts and at least every third of its TTL, until cancelled."""
+        while True:
+            try:
+                await asyncio.wait_for(renew_now.wait(), INGESTION_LOCK_TTL_SECONDS / 3)
+            except asyncio.TimeoutError:
+                pass
+            renew_now.clear()
+            try:
+                if not await asyncio.to_thread(renew_ingestion_lock, self._owner, INGESTION_LOCK_TTL_SECONDS):
+                    print(f"Ingestion job {job.id}: lease lost, another worker may start a run.")
+            except Exception as e:
+                print(f"Ingestion lease renewal failed: {e}")
+
+    async def _run(self, job):
+        try:
+            acquired = await asyncio.to_thread(acquire_ingestion_lock, self._owner, job.id, INGESTION_LOCK_TTL_SECONDS)
+        except Exception as e:
+            # Mongo unreachable: fail the job rather than leave it "queued", which blocks later runs
+            job.finish("failed", f"Could not take the ingestion lock: {e}")
+            return
+        if not acquired:
+            job.finish("skipped", "Another worker is already running ingestion.")
+            return
+        renew_now = asyncio.Event()
+        job.on_stage = renew_now.set
+        lease = asyncio.create_task(self._keep_lease(job, renew_now))
+        try:
+            job.start()
+            await self.target(job)
+            if job.status == "running":
+                job.finish("success")
+        except Exception as e:
+            job.finish("failed", str(e))
+        finally:
+            lease.cancel()
+            try:
+                await asyncio.to_thread(release_ingestion_lock, self._owner)
+            except Exception as e:
+                print(f"Ingestion lock release failed: {e}")
+
+    async def run_scheduler(self, interval_minutes=INGESTION_INTERVAL_MINUTES):
+        """Triggers a run every `interval_minutes` while the market is open."""
+        if interval_minutes <= 0:
+            return
+        print(f"Ingestion scheduler: every {interval_minutes} min during market hours.")
+        while True:
+            if is_market_open():
+                job, started = self.start(trigger="scheduled")
+                if started:
+                    print(f"Scheduled ingestion started (job {job.id}).")
+            await asyncio.sleep(interval_minutes * 60)
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import math
+import os
+from src.market_snapshot import get_market_snapshot
+from src.metrics import MARKET_FEED_MESSAGES
+
+# --- CONFIGURATION ---
+# How often each worker checks the snapshot version while clients are connected (one Mongo read)
+MARKET_FEED_POLL_SECONDS = float(os.getenv("MARKET_FEED_POLL_SECONDS", "2"))
+# Messages a slow client may fall behind before it is sent a fresh snapshot instead
+MARKET_FEED_QUEUE_SIZE = int(os.getenv("MARKET_FEED_QUEUE_SIZE", "16"))
+
+# Row layout of snapshot and delta messages
+FIELDS = ("symbol", "ltp", "pchange", "volume")
+
+def _number(value):
+    return None if math.isnan(value) else float(value)
+
+def _rows(snapshot):
+    """{symbol: [symbol, ltp, pchange, volume]}, NaN as None so unchanged rows compare equal."""
+    return {
+        symbol: [symbol, _number(ltp), _number(pchange), _number(volume)]
+        for symbol, ltp, pchange, volume in zip(snapshot.symbols, snapshot.ltp, snapshot.pchange, snapshot.volume)
+    }
+
+class MarketFeed:
+    """
+    Pushes the Nifty 50 table to WebSocket clients: a full snapshot when they connect, then
+    only the rows that changed after each ingestion. Each message is serialized once for all clients.
+    """
+
+    def __init__(self, poll_seconds=MARKET_FEED_POLL_SECONDS, queue_size=MARKET_FEED_QUEUE_SIZE):
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        self.version = None
+        self._rows = {}
+        self._subscribers = set()
+        self._lock = asyncio.Lock()
+
+    def _snapshot_message(self):
+        return json.dumps({"type": "snapshot", "version": self.version, "fields": FIELDS, "rows": list(self._rows.values())})
+
+    async def refresh(self):
+        """Reloads the snapshot if ingestion produced a new one and sends the changed rows."""
+        async with self._lock:
+            snapshot = await asyncio.to_thread(get_market_snapshot)
+            if snapshot.version == self.version:
+                return
+            rows = _rows(snapshot)
+            changed = [row for symbol, row in rows.items() if self._rows.get(symbol) != row]
+            removed = [symbol for symbol in self._rows if symbol not in rows]
+            first = self.version is None
+            self.version, self._rows = snapshot.version, rows
+            if first or not self._subscribers or not (changed or removed):
+                return
+            message = json.dumps({"type": "delta", "version": self.version, "rows": changed, "removed": removed})
+            for queue in self._subscribers:
+                try:
+                    queue.put_nowait(message)
+                    MARKET_FEED_MESSAGES.labels("delta").inc()
+                except asyncio.QueueFull:
+                    # Behind by too many deltas: replace them all with the current table
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(self._snapshot_message())
+                    MARKET_FEED_MESSAGES.labels("resync").inc()
+
+    async def subscribe(self):
+        """Returns a queue of JSON messages for one client, starting with the full snapshot."""
+        await self.refresh()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        # No await between the refresh and here, so no delta is missed or sent twice
+        queue.put_nowait(self._snapshot_message())
+        MARKET_FEED_MESSAGES.labels("snapshot").inc()
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    async def run(self):
+        """Polls for new snapshots while anyone is listening (ingestion may run in another worker)."""
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            if not self._subscribers:
+                continue
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Market Feed Error: {e}")
+
+market_feed = MarketFeed()
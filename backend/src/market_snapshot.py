@@ -0,0 +1,85 @@
+import threading
+import numpy as np
+from src.database import get_market_stats, get_snapshot_version
+
+# The index row itself ("NIFTY 50") is in the NSE table but is not a stock
+INDEX_SYMBOLS = {"NIFTY 50"}
+
+# Ranking metrics supported by MarketSnapshot.rank()
+METRICS = ("change", "volume", "range")
+
+def _column(records, key):
+    """Parses one column into float64, NaN where missing or unparsable (e.g. '1,234.5' strings)."""
+    values = np.full(len(records), np.nan)
+    for i, r in enumerate(records):
+        try:
+            values[i] = float(str(r.get(key)).replace(',', ''))
+        except (TypeError, ValueError):
+            pass
+    return values
+
+class MarketSnapshot:
+    """
+    Latest Nifty 50 table held as NumPy columns.
+    Parsing happens once per ingestion; ranking is a partial selection over arrays.
+    """
+
+    def __init__(self, records, version):
+        self.version = version
+        self.records = [r for r in records if r.get('SYMBOL')]
+        self.symbols = np.array([r['SYMBOL'] for r in self.records], dtype=object)
+        self.ltp = _column(self.records, 'LTP')
+        self.pchange = _column(self.records, '%CHNG')
+        self.volume = _column(self.records, 'VOLUME')
+        self.open = _column(self.records, 'OPEN')
+        self.high = _column(self.records, 'HIGH')
+        self.low = _column(self.records, 'LOW')
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Intraday range as % of the open price
+            self.range_pct = np.where(self.open > 0, (self.high - self.low) / self.open * 100, np.nan)
+        self.is_stock = np.array([s not in INDEX_SYMBOLS for s in self.symbols], dtype=bool)
+        self._positions = {s: i for i, s in enumerate(self.symbols)}
+
+    def __len__(self):
+        return len(self.records)
+
+    def row(self, symbol):
+        i = self._positions.get(symbol)
+        return None if i is None else self.records[i]
+
+    def _values(self, metric):
+        if metric == "volume":
+            return self.volume
+        if metric == "range":
+            return self.range_pct
+        return self.pchange
+
+    def top_k(self, metric="change", n=5, largest=True):
+        """Returns [(symbol, value)] for the n largest (or smallest) stocks by metric, index rows excluded."""
+        values = self._values(metric)
+        candidates = np.flatnonzero(self.is_stock & ~np.isnan(values))
+        if candidates.size == 0 or n <= 0:
+            return []
+        keys = -values[candidates] if largest else values[candidates]
+        n = min(n, candidates.size)
+        # O(N) selection of the n best, then sort only those n
+        picked = np.argpartition(keys, n - 1)[:n] if n < candidates.size else np.arange(candidates.size)
+        picked = picked[np.argsort(keys[picked], kind="stable")]
+        return [(self.symbols[i], float(values[i])) for i in candidates[picked]]
+
+    def rank(self, metric="change", n=5):
+        """(top n, bottom n) by metric."""
+        return self.top_k(metric, n, largest=True), self.top_k(metric, n, largest=False)
+
+_lock = threading.Lock()
+_snapshot = None
+
+def get_market_snapshot():
+    """Process-local snapshot, reloaded from Mongo only when the ingestion version changes."""
+    global _snapshot
+    version = get_snapshot_version()
+    if _snapshot is None or _snapshot.version != version:
+        with _lock:
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = MarketSnapshot(get_market_stats(), version)
+    return _snapshot
@@ -0,0 +1,152 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import Counter, Histogram, CollectorRegistry, REGISTRY, generate_latest, multiprocess
+
+# --- CONFIGURATION ---
+# Requests slower than this print their span breakdown (0 disables)
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+# Set with several uvicorn workers so /metrics aggregates all of them (see prometheus_client docs)
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# p50/p95/p99 come from these via histogram_quantile() in Prometheus
+REQUEST_SECONDS = Histogram(
+    "nifty_request_seconds", "End-to-end chat request latency", ["endpoint", "served_by"], buckets=LATENCY_BUCKETS)
+OPERATION_SECONDS = Histogram(
+    "nifty_operation_seconds", "Latency of LLM calls, tools, Chroma, embedding and Mongo operations",
+    ["component", "operation", "status"], buckets=LATENCY_BUCKETS)
+TOOL_CALLS = Counter("nifty_tool_calls", "Agent tool invocations", ["tool", "status"])
+AGENT_ITERATIONS = Histogram(
+    "nifty_agent_iterations", "LLM calls per agent run", buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 25))
+LLM_TOKENS = Counter("nifty_llm_tokens", "Tokens used by LLM calls", ["kind"])
+MARKET_FEED_MESSAGES = Counter(
+    "nifty_market_feed_messages", "Messages queued to /ws/market clients (snapshot, delta, resync)", ["type"])
+PREFETCHES = Counter("nifty_prefetches", "Speculative prefetch results by outcome (hit, miss, cancelled, unused, error)", ["kind", "outcome"])
+INGESTION_STAGE_SECONDS = Histogram(
+    "nifty_ingestion_stage_seconds", "Duration of ingestion pipeline stages", ["stage", "status"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+
+# Spans of the request being handled; asyncio.to_thread copies the context, so blocking helpers report here too
+_trace = contextvars.ContextVar("request_trace", default=None)
+
+def _record_span(trace, component, operation, seconds, status):
+    if trace is not None:
+        offset = (time.perf_counter() - seconds - trace["t0"]) * 1000
+        trace["spans"].append((component, operation, round(seconds * 1000, 1), round(offset, 1), status))
+
+@contextmanager
+def timed(component, operation):
+    """Times a block into OPERATION_SECONDS and the current request trace."""
+    t0 = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        seconds = time.perf_counter() - t0
+        OPERATION_SECONDS.labels(component, operation, status).observe(seconds)
+        _record_span(_trace.get(), component, operation, seconds, status)
+
+def instrumented(component):
+    """Decorator form of timed(); the operation label is the function name."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(component, func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def request_trace(endpoint):
+    """
+    Collects spans for one chat request and records its latency.
+    Set trace["served_by"] inside the block; slow requests print their spans.
+    """
+    trace = {"endpoint": endpoint, "served_by": "agent", "spans": [], "t0": time.perf_counter()}
+    _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.set(None)
+        seconds = time.perf_counter() - trace["t0"]
+        REQUEST_SECONDS.labels(endpoint, trace["served_by"]).observe(seconds)
+        if SLOW_REQUEST_MS and seconds * 1000 > SLOW_REQUEST_MS:
+            spans = " | ".join(f"+{offset:.0f}ms {component}:{operation} {ms:.0f}ms{'' if status == 'ok' else ' (' + status + ')'}"
+                               for component, operation, ms, offset, status in sorted(trace["spans"], key=lambda span: span[3]))
+            print(f"Slow request {endpoint} ({trace['served_by']}): {seconds * 1000:.0f} ms. {spans or 'no spans'}")
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Per-run LangChain callback: times LLM calls and tools, counts tokens and agent iterations."""
+
+    run_inline = True  # only bookkeeping, no need for a thread hop
+
+    def __init__(self, trace=None):
+        self.trace = trace
+        self.llm_calls = 0
+        self._starts = {}
+
+    def _start(self, run_id, name=None):
+        self._starts[run_id] = (time.perf_counter(), name)
+
+    def _end(self, run_id, component, default_name, status="ok"):
+        t0, name = self._starts.pop(run_id, (None, None))
+        if t0 is None:
+            return None
+        seconds = time.perf_counter() - t0
+        name = name or default_name
+        OPERATION_SECONDS.labels(component, name, status).observe(seconds)
+        _record_span(self.trace, component, name, seconds, status)
+        return name
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, (kwargs.get("metadata") or {}).get("ls_model_name"))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, (kwargs.get("metadata") or {}).get("ls_model_name"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self.llm_calls += 1
+        self._end(run_id, "llm", "chat_model")
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        if usage:
+            LLM_TOKENS.labels("prompt").inc(usage.get("input_tokens", 0))
+            LLM_TOKENS.labels("completion").inc(usage.get("output_tokens", 0))
+        else:
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            LLM_TOKENS.labels("prompt").inc(token_usage.get("prompt_tokens", 0))
+            LLM_TOKENS.labels("completion").inc(token_usage.get("completion_tokens", 0))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.llm_calls += 1
+        self._end(run_id, "llm", "chat_model", "error")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, (serialized or {}).get("name") or kwargs.get("name"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        TOOL_CALLS.labels(self._end(run_id, "tool", "tool") or "tool", "ok").inc()
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        TOOL_CALLS.labels(self._end(run_id, "tool", "tool", "error") or "tool", "error").inc()
+
+    def finish(self):
+        """Call once the agent run is over."""
+        AGENT_ITERATIONS.observe(self.llm_calls)
+
+def render_metrics():
+    """Prometheus text exposition, aggregated across worker processes in multiprocess mode."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
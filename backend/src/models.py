@@ -6,9 +6,30 @@ from datetime import datetime
 # Used by FastAPI in main.py
 class QueryRequest(BaseModel):
     query: str = Field(..., description="The user's question about Nifty 50 data.")
+    session_id: Optional[str] = Field(None, description="Conversation ID; earlier turns of the session are kept on the server.")
 
 class QueryResponse(BaseModel):
     answer: str
+    served_by: str = "agent"   # "fast_path", "cache" or "agent"
+    session_id: Optional[str] = None
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, description="Questions answered together; results keep this order.")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="Questions in flight at once (capped by BATCH_MAX_CONCURRENCY).")
+
+class BatchItemResponse(BaseModel):
+    query: str
+    answer: Optional[str] = None
+    served_by: str = "agent"   # "fast_path", "cache", "agent" or "error"
+    latency_ms: float
+    duplicate_of: Optional[int] = None   # index of the identical question whose answer this reuses
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchItemResponse]
+    latency_ms: float
+    shared: dict   # embedding calls and tool calls saved by sharing work across the batch
     timestamp: datetime = Field(default_factory=datetime.now)
 
 # --- Database / Scraping Models ---
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+import httpx
+
+# --- CONFIGURATION ---
+NSE_BASE_URL = os.getenv("NSE_BASE_URL", "https://www.nseindia.com")
+# Upper bound on how long bootstrapped cookies are reused, even if they claim to live longer
+NSE_SESSION_TTL_SECONDS = int(os.getenv("NSE_SESSION_TTL_SECONDS", "1800"))
+NSE_TIMEOUT_SECONDS = float(os.getenv("NSE_TIMEOUT_SECONDS", "15"))
+NSE_MAX_CONNECTIONS = int(os.getenv("NSE_MAX_CONNECTIONS", "10"))
+# When set, raw API / fallback payloads are saved here for offline replay (benchmarks/nse_replay.py)
+NSE_RECORD_DIR = os.getenv("NSE_RECORD_DIR", "")
+# Real User-Agent is CRITICAL for NSE
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# name -> (API path, referer page). Add new NSE JSON endpoints here.
+ENDPOINTS = {
+    "market_stats": ("/api/equity-stockIndices?index=NIFTY%2050", "/market-data/live-equity-market?symbol=NIFTY%2050"),
+    "option_chain": ("/api/option-chain-indices?symbol=NIFTY", "/option-chain"),
+}
+
+def record_fixture(name, data):
+    """Saves one raw payload as <NSE_RECORD_DIR>/<name>-<timestamp>.json (recording mode only)."""
+    if not NSE_RECORD_DIR or data is None:
+        return
+    os.makedirs(NSE_RECORD_DIR, exist_ok=True)
+    path = os.path.join(NSE_RECORD_DIR, f"{name}-{datetime.now():%Y%m%d-%H%M%S-%f}.json")
+    with open(path, "w") as f:
+        json.dump(data, f, default=str)
+    print(f"Recorded fixture: {path}")
+
+def get_driver():
+    """Initializes a Stealth Chrome Driver to bypass NSE Bot Detection."""
+    # Imported here so workers that never bootstrap a session don't load Selenium
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")  # Run in background
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+    chrome_options.add_argument(f"user-agent={USER_AGENT}")
+
+    service = Service(ChromeDriverManager().install())
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+def bootstrap_cookies_with_browser(base_url=NSE_BASE_URL, timeout=20):
+    """
+    Loads NSE once in headless Chrome and returns (cookies, expires_at).
+    Waits until the page has finished loading and set its cookies instead of sleeping.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    driver = get_driver()
+    try:
+        print(f"Bootstrapping NSE session via {base_url} ...")
+        driver.get(base_url)
+        WebDriverWait(driver, timeout, poll_frequency=0.2).until(
+            lambda d: d.execute_script("return document.readyState") == "complete" and d.get_cookies()
+        )
+        cookies = driver.get_cookies()
+    finally:
+        driver.quit()
+    expiries = [c["expiry"] for c in cookies if c.get("expiry")]
+    expires_at = min([time.time() + NSE_SESSION_TTL_SECONDS] + expiries)
+    return {c["name"]: c["value"] for c in cookies}, expires_at
+
+class NSESession:
+    """
+    Pooled async HTTP client for NSE's JSON APIs.
+    Session cookies are obtained once and reused across ingestion runs until they
+    expire or NSE rejects them; independent endpoints are fetched concurrently.
+    """
+
+    def __init__(self, base_url=NSE_BASE_URL):
+        self.base_url = base_url.rstrip("/")
+        self._cookies = {}
+        self._expires_at = 0.0
+        self._client = None
+        self._loop = None
+        self._lock = None
+        self._generation = 0  # bumped on every session refresh
+
+    async def _get_client(self):
+        # httpx clients are bound to the event loop they were created on
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                try:
+                    await self._client.aclose()
+                except Exception as e:
+                    # Its connections belong to a loop that may already be closed
+                    print(f"Closing previous NSE client failed: {e}")
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "User-Agent": USER_AGENT,
+                    "Accept": "application/json, text/plain, */*",
+                    "Accept-Language": "en-US,en;q=0.9",
+                    "X-Requested-With": "XMLHttpRequest",
+                },
+                cookies=self._cookies,
+                limits=httpx.Limits(max_connections=NSE_MAX_CONNECTIONS, max_keepalive_connections=NSE_MAX_CONNECTIONS),
+                timeout=NSE_TIMEOUT_SECONDS,
+                follow_redirects=True,
+            )
+            self._loop = loop
+            self._lock = asyncio.Lock()
+        return self._client
+
+    @property
+    def session_valid(self):
+        return bool(self._cookies) and time.time() < self._expires_at
+
+    async def ensure_session(self, force=False, rejected_generation=None):
+        """
+        force: NSE rejected the cookies of rejected_generation. Concurrent requests rejected together
+        refresh once; the others find a newer session when they get the lock and reuse it.
+        """
+        client = await self._get_client()
+        async with self._lock:
+            if self.session_valid and (not force or self._generation != rejected_generation):
+                return
+            # Cheap path first: a plain GET of the home page usually hands out the cookies
+            try:
+                response = await client.get("/", headers={"Accept": "text/html"})
+                if response.cookies and not force:
+                    self._cookies = dict(client.cookies)
+                    self._expires_at = time.time() + NSE_SESSION_TTL_SECONDS
+                    self._generation += 1
+                    return
+            except httpx.HTTPError as e:
+                print(f"NSE home page fetch failed: {e}")
+            # Bot protection kicked in: let a real browser solve it, off the event loop
+            cookies, expires_at = await asyncio.to_thread(bootstrap_cookies_with_browser, self.base_url)
+            client.cookies.update(cookies)
+            self._cookies = dict(client.cookies)
+            self._expires_at = expires_at
+            self._generation += 1
+
+    async def fetch_json(self, api_path, referer_path=None):
+        """Fetches one API, refreshing the session once if NSE rejects the cookies."""
+        client = await self._get_client()
+        await self.ensure_session()
+        generation = self._generation
+        headers = {"Referer": self.base_url + referer_path} if referer_path else {}
+        response = await client.get(api_path, headers=headers)
+        if response.status_code in (401, 403):
+            await self.ensure_session(force=True, rejected_generation=generation)
+            response = await client.get(api_path, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch_endpoints(self, names):
+        """Fetches several ENDPOINTS concurrently. Returns {name: data or None}."""
+        async def fetch(name):
+            api_path, referer = ENDPOINTS[name]
+            try:
+                print(f"Fetching API: {api_path}")
+                data = await self.fetch_json(api_path, referer)
+                record_fixture(name, data)
+                return data
+            except Exception as e:
+                print(f"API Fetch Error ({name}): {e}")
+                return None
+
+        results = await asyncio.gather(*(fetch(name) for name in names))
+        return dict(zip(names, results))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+nse_session = NSESession()
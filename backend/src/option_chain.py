@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# Per-side fields kept from the NSE payload -> column suffix
+SIDE_FIELDS = {
+    "openInterest": "oi",
+    "changeinOpenInterest": "chg_oi",
+    "impliedVolatility": "iv",
+    "lastPrice": "ltp",
+    "change": "price_chg",
+    "totalTradedVolume": "volume",
+}
+BUILD_UP_LABELS = ["long_build_up", "short_build_up", "short_covering", "long_unwinding"]
+
+def _parse_expiry(value):
+    try:
+        return datetime.strptime(str(value), "%d-%b-%Y")
+    except (TypeError, ValueError):
+        return pd.NaT
+
+def build_option_chain_frame(data):
+    """
+    Flattens the option-chain-indices payload into one row per (expiry, strike)
+    with CE/PE OI, change in OI, IV, LTP, price change and volume columns.
+    """
+    rows = ((data or {}).get("records") or {}).get("data") or []
+    if not rows:
+        return pd.DataFrame()
+    raw = pd.json_normalize(rows)
+    frame = pd.DataFrame({
+        "expiry": raw.get("expiryDate"),
+        "strike": pd.to_numeric(raw.get("strikePrice"), errors="coerce"),
+    })
+    for side in ("CE", "PE"):
+        for field, suffix in SIDE_FIELDS.items():
+            column = raw.get(f"{side}.{field}")
+            values = pd.to_numeric(column, errors="coerce") if column is not None else np.nan
+            frame[f"{side.lower()}_{suffix}"] = values
+    frame = frame.dropna(subset=["strike"]).fillna({c: 0.0 for c in frame.columns if c not in ("expiry", "strike")})
+    frame["expiry_date"] = frame["expiry"].map(_parse_expiry)
+    return frame.sort_values(["expiry_date", "strike"]).reset_index(drop=True)
+
+def max_pain(strikes, ce_oi, pe_oi):
+    """Strike at which option writers pay out the least at expiry (vectorized over all candidates)."""
+    diff = strikes[None, :] - strikes[:, None]           # [written strike i, settlement j]
+    payout = ce_oi @ np.clip(diff, 0, None) + pe_oi @ np.clip(-diff, 0, None)
+    return float(strikes[int(np.argmin(payout))])
+
+def classify_build_up(price_chg, chg_oi):
+    """Standard OI interpretation: price and OI up = long build-up, price down + OI up = short build-up, ..."""
+    conditions = [
+        (price_chg > 0) & (chg_oi > 0),
+        (price_chg < 0) & (chg_oi > 0),
+        (price_chg > 0) & (chg_oi < 0),
+        (price_chg < 0) & (chg_oi < 0),
+    ]
+    return np.select(conditions, BUILD_UP_LABELS, default="neutral")
+
+def compute_analytics(frame, underlying, expiry=None):
+    """PCR, max pain, ATM strike, support/resistance and OI build-up for one expiry (nearest by default)."""
+    if frame.empty:
+        return None
+    if expiry is None:
+        dated = frame["expiry_date"].dropna()
+        expiry = frame.loc[dated.idxmin(), "expiry"] if len(dated) else frame["expiry"].iloc[0]
+    chain = frame[frame["expiry"] == expiry]
+    strikes = chain["strike"].to_numpy(dtype=float)
+    ce_oi = chain["ce_oi"].to_numpy(dtype=float)
+    pe_oi = chain["pe_oi"].to_numpy(dtype=float)
+
+    atm_idx = int(np.argmin(np.abs(strikes - underlying))) if underlying else len(strikes) // 2
+    atm = chain.iloc[atm_idx]
+    ce_build = classify_build_up(chain["ce_price_chg"].to_numpy(), chain["ce_chg_oi"].to_numpy())
+    pe_build = classify_build_up(chain["pe_price_chg"].to_numpy(), chain["pe_chg_oi"].to_numpy())
+
+    def top_strikes(column, n=3):
+        top = chain.nlargest(n, column)
+        return [{"strike": float(s), "oi": float(v)} for s, v in zip(top["strike"], top[column])]
+
+    ce_total, pe_total = ce_oi.sum(), pe_oi.sum()
+    ce_chg_total, pe_chg_total = chain["ce_chg_oi"].sum(), chain["pe_chg_oi"].sum()
+    return {
+        "expiry": expiry,
+        "underlying": float(underlying) if underlying else None,
+        "atm_strike": float(atm["strike"]),
+        "atm_ce_ltp": float(atm["ce_ltp"]),
+        "atm_pe_ltp": float(atm["pe_ltp"]),
+        "atm_straddle": round(float(atm["ce_ltp"] + atm["pe_ltp"]), 2),
+        "atm_iv": round(float((atm["ce_iv"] + atm["pe_iv"]) / 2), 2),
+        "pcr_oi": round(float(pe_total / ce_total), 3) if ce_total else None,
+        "pcr_chg_oi": round(float(pe_chg_total / ce_chg_total), 3) if ce_chg_total else None,
+        "pcr_oi_all_expiries": round(float(frame["pe_oi"].sum() / frame["ce_oi"].sum()), 3) if frame["ce_oi"].sum() else None,
+        "max_pain": max_pain(strikes, ce_oi, pe_oi) if len(strikes) else None,
+        # Highest call OI acts as resistance, highest put OI as support
+        "resistance": top_strikes("ce_oi"),
+        "support": top_strikes("pe_oi"),
+        "ce_build_up": {label: int((ce_build == label).sum()) for label in BUILD_UP_LABELS},
+        "pe_build_up": {label: int((pe_build == label).sum()) for label in BUILD_UP_LABELS},
+        "strikes": int(len(strikes)),
+    }
+
+def analyze_option_chain(data, symbol="NIFTY"):
+    """Returns (frame, analytics) for the payload, or (empty frame, None) if it has no chain."""
+    frame = build_option_chain_frame(data)
+    records = (data or {}).get("records") or {}
+    analytics = compute_analytics(frame, records.get("underlyingValue"))
+    if analytics is not None:
+        analytics["symbol"] = symbol
+        analytics["timestamp"] = records.get("timestamp")
+        analytics["expiries"] = int(frame["expiry"].nunique())
+    return frame, analytics
+
+def format_option_chain_summary(a):
+    """Compact sentence form used for the RAG document and the agent tool."""
+    support = ", ".join(f"{s['strike']:g} ({s['oi']:,.0f})" for s in a["support"])
+    resistance = ", ".join(f"{s['strike']:g} ({s['oi']:,.0f})" for s in a["resistance"])
+    return (
+        f"{a['symbol']} Option Chain ({a.get('timestamp')}, expiry {a['expiry']}): "
+        f"Underlying {a['underlying']}. ATM strike {a['atm_strike']:g} "
+        f"(CE {a['atm_ce_ltp']}, PE {a['atm_pe_ltp']}, straddle {a['atm_straddle']}, IV {a['atm_iv']}). "
+        f"PCR (OI) {a['pcr_oi']}, PCR (change in OI) {a['pcr_chg_oi']}, PCR all expiries {a['pcr_oi_all_expiries']}. "
+        f"Max pain {a['max_pain']:g}. Support (put OI): {support}. Resistance (call OI): {resistance}. "
+        f"Call OI build-up: {a['ce_build_up']}. Put OI build-up: {a['pe_build_up']}."
+    )
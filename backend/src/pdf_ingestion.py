@@ -0,0 +1,140 @@
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from langchain_core.documents import Document
+from src.database import get_ingested_files, is_content_ingested, mark_file_ingested
+from src.fast_path import get_symbol_index
+from src.pdf_parser import parse_pdf
+from src.vector_store import add_documents, delete_documents, embed_documents
+
+# --- CONFIGURATION ---
+PDF_DATA_DIR = os.getenv("PDF_DATA_DIR", "./data")
+PDF_INGESTION_ENABLED = os.getenv("PDF_INGESTION_ENABLED", "1") == "1"
+# Defaults to every core; parsing is CPU-bound so threads would serialize on the GIL
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or os.cpu_count() or 1
+# Chunks embedded and upserted per Chroma call
+PDF_UPSERT_BATCH = int(os.getenv("PDF_UPSERT_BATCH", "256"))
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _mark_ingested(content_hash, path, size, mtime, **result):
+    # Content the path held before (edited in place) goes with its chunks once no file holds it
+    for orphan in mark_file_ingested(content_hash, path, size, mtime, **result):
+        delete_documents({"content_hash": orphan})
+
+def find_new_files(data_dir=PDF_DATA_DIR):
+    """
+    Returns ([(path, hash, size, mtime)] to ingest, [(path, hash, size, mtime)] copies of those, skipped count).
+    Unchanged files (same path, size and mtime) are skipped without being read;
+    changed ones are hashed and skipped if that content was ingested before under any name.
+    """
+    paths = []
+    for root, _, names in os.walk(data_dir):
+        paths.extend(os.path.join(root, n) for n in names if n.lower().endswith(".pdf"))
+    known = get_ingested_files(paths)
+
+    candidates = []
+    for path in paths:
+        stat = os.stat(path)
+        record = known.get(path)
+        if record and record.get("size") == stat.st_size and record.get("mtime") == stat.st_mtime:
+            continue
+        candidates.append((path, stat.st_size, stat.st_mtime))
+
+    with ThreadPoolExecutor(max_workers=min(8, PDF_WORKERS)) as pool:
+        hashes = list(pool.map(file_hash, [c[0] for c in candidates]))
+
+    new, copies, seen = [], [], set()
+    for (path, size, mtime), content_hash in zip(candidates, hashes):
+        if content_hash in seen:
+            # Same content as another new file: recorded under its own path once that one is ingested
+            copies.append((path, content_hash, size, mtime))
+            continue
+        if is_content_ingested(content_hash):
+            _mark_ingested(content_hash, path, size, mtime)
+            continue
+        seen.add(content_hash)
+        new.append((path, content_hash, size, mtime))
+    return new, copies, len(paths) - len(new)
+
+def _file_metadata(path, content_hash, chunks, symbol_index):
+    """Tags every chunk of a filing with the stock it is about (from the filename, else the first page)."""
+    name = os.path.basename(path)
+    symbols = symbol_index.match(os.path.splitext(name)[0].replace("_", " ").replace("-", " "))
+    if not symbols and chunks:
+        symbols = symbol_index.match(chunks[0][1])
+    symbol = symbols[0] if symbols else ""
+    record = symbol_index.records.get(symbol) or {}
+    day = datetime.fromtimestamp(os.path.getmtime(path))
+    return {
+        "source": name, "type": "pdf", "symbol": symbol, "company": record.get("COMPANY") or "",
+        "date": day.strftime("%Y-%m-%d"), "day": int(day.strftime("%Y%m%d")), "content_hash": content_hash,
+    }
+
+def ingest_pdfs(data_dir=PDF_DATA_DIR, stats=None):
+    """
+    Parses new PDFs under data_dir in a process pool and upserts their chunks in batches.
+    Cost scales with the number of new files; a file is marked ingested only after
+    all of its chunks are in Chroma, so an interrupted run picks it up again.
+    """
+    new, copies, skipped = find_new_files(data_dir)
+    summary = {"files_new": len(new), "files_skipped": skipped, "chunks": 0, "errors": 0}
+    if new:
+        symbol_index = get_symbol_index()
+        by_path = {path: (content_hash, size, mtime) for path, content_hash, size, mtime in new}
+        docs, ids, pending = [], [], []
+
+        def flush():
+            if docs:
+                add_documents(docs, ids, embed_documents(docs))
+                summary["chunks"] += len(docs)
+            for path, count in pending:
+                content_hash, size, mtime = by_path[path]
+                _mark_ingested(content_hash, path, size, mtime, chunks=count)
+            docs.clear()
+            ids.clear()
+            pending.clear()
+
+        def handle(path, chunks, error):
+            content_hash, size, mtime = by_path[path]
+            if error:
+                # Remembered like a success so a corrupt file is not re-parsed every run, until it changes
+                print(f"Failed to parse {path}: {error}")
+                _mark_ingested(content_hash, path, size, mtime, chunks=0, error=error)
+                summary["errors"] += 1
+                return
+            metadata = _file_metadata(path, content_hash, chunks, symbol_index)
+            for i, (page, text) in enumerate(chunks):
+                docs.append(Document(page_content=text, metadata={**metadata, "page": page, "chunk": i}))
+                ids.append(f"pdf:{content_hash}:{i}")
+            pending.append((path, len(chunks)))
+            if len(docs) >= PDF_UPSERT_BATCH:
+                flush()
+
+        workers = min(PDF_WORKERS, len(new))
+        if workers == 1:
+            # Not worth a pool start-up for a single file
+            for path in by_path:
+                handle(*parse_pdf(path))
+        else:
+            # spawn: ingestion runs inside a threaded server process, where fork is unsafe
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                for future in as_completed([pool.submit(parse_pdf, path) for path in by_path]):
+                    handle(*future.result())
+        flush()
+        for path, content_hash, size, mtime in copies:
+            if is_content_ingested(content_hash):
+                _mark_ingested(content_hash, path, size, mtime)
+    print(f"PDF ingestion: {summary['files_new']} new files, {summary['files_skipped']} unchanged, "
+          f"{summary['chunks']} chunks, {summary['errors']} errors.")
+    if stats is not None:
+        stats.update(summary)
+    return summary
@@ -0,0 +1,46 @@
+import re
+
+# Worker-side half of the PDF pipeline. Kept free of Mongo / Chroma / model imports
+# so process-pool workers start in milliseconds.
+
+CHUNK_SIZE = 1000      # characters
+CHUNK_OVERLAP = 150
+
+def iter_pages(path):
+    """Yields (page number, text) one page at a time, so a 500-page filing never sits in memory whole."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(path) as pdf:
+        for number, page in enumerate(pdf, start=1):
+            text = re.sub(r"\s+", " ", page.get_text("text")).strip()
+            if text:
+                yield number, text
+
+def iter_chunks(pages, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    Streams (page, text) chunks of ~size characters over a page iterator.
+    Text carries across page breaks; a chunk is tagged with the page it starts on.
+    Cuts fall on the last space before the limit where possible.
+    """
+    buffer, start_page = "", None
+    for number, text in pages:
+        if start_page is None:
+            start_page = number
+        buffer = f"{buffer} {text}".strip()
+        while len(buffer) >= size:
+            cut = buffer.rfind(" ", size // 2, size)
+            cut = cut if cut > 0 else size
+            yield start_page, buffer[:cut].strip()
+            # Next chunk re-reads the last `overlap` characters, starting on a word boundary
+            resume = buffer.find(" ", max(cut - overlap, 0), cut)
+            buffer = buffer[resume + 1 if resume >= 0 else cut:]
+            start_page = number
+    if buffer.strip():
+        yield start_page, buffer.strip()
+
+def parse_pdf(path):
+    """Process-pool entry point: path -> (path, [(page, chunk)], error or None)."""
+    try:
+        return path, list(iter_chunks(iter_pages(path))), None
+    except Exception as e:
+        return path, [], str(e)
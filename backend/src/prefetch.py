@@ -0,0 +1,107 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from src.metrics import PREFETCHES
+
+# --- CONFIGURATION ---
+# Start the likely tool work (vector search for the raw question, market snapshot) while the LLM plans
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "0") == "1"
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+# Prefetch of the request being answered; tools run with a copy of the request context, so they see it
+_current = contextvars.ContextVar("prefetch", default=None)
+
+class Prefetch:
+    """
+    Speculative work for one chat request. Results are keyed on the exact inputs they were
+    computed for, and a tool takes one only if it would have asked for the same thing.
+    """
+
+    def __init__(self):
+        self._futures = {}   # (kind, key) -> Future
+        self._taken = set()
+        self._finished = False
+        self._lock = threading.Lock()  # searches are submitted from a pool thread
+
+    def submit(self, kind, key, fn, *args):
+        # Copied context: spans land in the request trace, /chat/batch sharing still applies
+        context = contextvars.copy_context()
+        with self._lock:
+            if not self._finished:
+                self._futures[(kind, key)] = _executor.submit(context.run, fn, *args)
+
+    def take(self, kind, key=None):
+        """
+        Waits for the matching prefetch if it is running; None if nothing matching was prefetched,
+        it failed, or it had not started yet (it is cancelled and the caller computes it itself,
+        rather than queueing behind other requests' speculative work).
+        """
+        with self._lock:
+            future = self._futures.get((kind, key))
+            if future is not None:
+                self._taken.add((kind, key))
+        if future is None:
+            PREFETCHES.labels(kind, "miss").inc()
+            return None
+        if future.cancel():
+            PREFETCHES.labels(kind, "cancelled").inc()
+            return None
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Prefetch Error ({kind}): {e}")
+            PREFETCHES.labels(kind, "error").inc()
+            return None
+        PREFETCHES.labels(kind, "hit").inc()
+        return result
+
+    def finish(self):
+        with self._lock:
+            self._finished = True
+        for (kind, key), future in self._futures.items():
+            if (kind, key) not in self._taken:
+                future.cancel()
+                PREFETCHES.labels(kind, "unused").inc()
+
+def take_prefetched(kind, key=None):
+    """Result prefetched for the current request, or None (then the caller computes it as usual)."""
+    prefetch = _current.get()
+    return prefetch.take(kind, key) if prefetch is not None else None
+
+def _start(prefetch, query):
+    # Imported here: both modules import this one
+    from src.market_snapshot import get_market_snapshot
+
+    prefetch.submit("market_snapshot", None, get_market_snapshot)
+    # Matching the question's symbols can reload the snapshot from Mongo, so that runs in the pool as well
+    _executor.submit(contextvars.copy_context().run, _submit_searches, prefetch, query)
+
+def _submit_searches(prefetch, query):
+    from src.retrieval import prefetch_searches
+    try:
+        for key, fn, args in prefetch_searches(query):
+            prefetch.submit("search", key, fn, *args)
+    except Exception as e:
+        print(f"Prefetch Error (search): {e}")
+
+@contextmanager
+def prefetching(query):
+    """
+    Wrap an agent run: starts the prefetch for query and makes it visible to the tools.
+    A no-op unless PREFETCH_ENABLED.
+    """
+    if not PREFETCH_ENABLED:
+        yield None
+        return
+    prefetch = Prefetch()
+    token = _current.set(prefetch)
+    try:
+        _start(prefetch, query)
+        yield prefetch
+    finally:
+        _current.reset(token)
+        prefetch.finish()
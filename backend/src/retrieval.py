@@ -0,0 +1,178 @@
+import os
+import re
+import threading
+from collections import Counter
+import numpy as np
+from langchain_core.documents import Document
+from src.database import get_snapshot_version
+from src.fast_path import get_symbol_index
+from src.vector_store import get_vector_store, get_generation, embed_query
+from src.metrics import timed
+from src.prefetch import take_prefetched
+from src.market_snapshot import INDEX_SYMBOLS
+
+# --- CONFIGURATION ---
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "1") == "1"
+# Candidates taken from each retriever before fusion
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Ticker and company name count this many times as much as a word in the text
+SYMBOL_FIELD_WEIGHT = 3
+BM25_K1, BM25_B = 1.5, 0.75
+FILTER_FIELDS = ("symbol", "type", "source", "date")
+
+def tokenize(text):
+    return re.findall(r"[a-z0-9&]+", (text or "").lower())
+
+class KeywordIndex:
+    """
+    BM25 over page content plus the ticker and company name from metadata, so
+    "INFY" and "Infosys" hit the right documents even when the embedding misses them.
+    """
+
+    def __init__(self, ids, documents, metadatas, version=None):
+        self.version = version
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = [m or {} for m in metadatas]
+        self.postings = {}  # token -> (doc indices, term frequencies)
+        lengths = np.zeros(len(self.ids), dtype=np.float32)
+        postings = {}
+        for i, (text, meta) in enumerate(zip(self.documents, self.metadatas)):
+            tokens = tokenize(text) + SYMBOL_FIELD_WEIGHT * tokenize(f"{meta.get('symbol', '')} {meta.get('company', '')}")
+            lengths[i] = len(tokens)
+            for token, tf in Counter(tokens).items():
+                postings.setdefault(token, ([], []))
+                postings[token][0].append(i)
+                postings[token][1].append(tf)
+        for token, (rows, tfs) in postings.items():
+            self.postings[token] = (np.array(rows, dtype=np.int64), np.array(tfs, dtype=np.float32))
+        self.lengths = lengths
+        self.avg_length = float(lengths.mean()) if len(lengths) else 0.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mask(self, filters):
+        """Boolean row mask for exact-match metadata filters ({"symbol": ["INFY", "TCS"], "type": ...})."""
+        keep = np.ones(len(self.ids), dtype=bool)
+        for field, values in (filters or {}).items():
+            allowed = set(values)
+            keep &= np.array([str(m.get(field, "")) in allowed for m in self.metadatas], dtype=bool)
+        return keep
+
+    def search(self, query_tokens, k, filters=None):
+        """Returns [(row, score)] for the k best-scoring documents matching the filters."""
+        if not len(self.ids):
+            return []
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        n = len(self.ids)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths / (self.avg_length or 1.0))
+        for token in set(query_tokens):
+            if token not in self.postings:
+                continue
+            rows, tfs = self.postings[token]
+            idf = np.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (BM25_K1 + 1) / (tfs + norm[rows])
+        if filters:
+            scores[~self.mask(filters)] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(i), float(scores[i])) for i in ordered]
+
+_lock = threading.Lock()
+_index = None
+
+def get_keyword_index():
+    """
+    Rebuilt after this process writes to the vector store (add_documents / delete_documents) or
+    another worker publishes a new snapshot; neither check touches Chroma or Mongo on a normal search.
+    """
+    global _index
+    version = (get_snapshot_version(), get_generation())
+    if _index is None or _index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                with timed("chroma", "load_keyword_index"):
+                    data = get_vector_store().get(include=["documents", "metadatas"])
+                _index = KeywordIndex(data["ids"], data["documents"], data["metadatas"], version)
+    return _index
+
+def parse_filters(symbol="", doc_type="", source="", date=""):
+    """Tool arguments -> {field: [values]}; comma-separated values mean 'any of'."""
+    filters = {}
+    for field, value in zip(FILTER_FIELDS, (symbol, doc_type, source, date)):
+        values = [v.strip() for v in str(value or "").split(",") if v.strip()]
+        if values:
+            filters[field] = [v.upper() for v in values] if field == "symbol" else values
+    return filters
+
+def to_chroma_where(filters):
+    clauses = [{field: values[0]} if len(values) == 1 else {field: {"$in": values}}
+               for field, values in filters.items()]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def dense_search(query, fetch_k, where=None):
+    query_vector = embed_query(query)
+    with timed("chroma", "query"):
+        return get_vector_store().similarity_search_by_vector(query_vector, k=fetch_k, filter=where)
+
+def _search_key(query, fetch_k, where):
+    return query.strip(), fetch_k, repr(where)
+
+def prefetch_searches(query):
+    """
+    Dense searches worth starting before the agent asks: the raw question unfiltered, and
+    filtered to the stocks it names (the agent is told to pass those as the symbol filter).
+    Yields (key, function, args); hybrid_search takes a result only if its key matches exactly.
+    """
+    wheres = [None]
+    symbols = [s for s in get_symbol_index().match(query) if s not in INDEX_SYMBOLS]
+    if symbols:
+        wheres.append(to_chroma_where(parse_filters(symbol=",".join(symbols))))
+    for where in wheres:
+        yield _search_key(query, RETRIEVAL_FETCH_K, where), dense_search, (query, RETRIEVAL_FETCH_K, where)
+
+def hybrid_search(query, k=3, filters=None):
+    """
+    Dense search and BM25 run over the same metadata pre-filter and are merged
+    with reciprocal rank fusion, so a document both retrievers agree on ranks first.
+    """
+    fetch_k = max(k, RETRIEVAL_FETCH_K)
+    where = to_chroma_where(filters or {})
+    dense = take_prefetched("search", _search_key(query, fetch_k, where))
+    if dense is None:
+        dense = dense_search(query, fetch_k, where)
+    if not HYBRID_SEARCH_ENABLED:
+        return dense[:k]
+
+    index = get_keyword_index()
+    # Resolved tickers ("Infosys" -> INFY) are added so the symbol field matches
+    symbols = get_symbol_index().match(query)
+    tokens = tokenize(query) + [t for s in symbols for t in tokenize(s)]
+    with timed("bm25", "search"):
+        sparse = index.search(tokens, fetch_k, filters)
+
+    # Identical chunks (e.g. boilerplate repeated across filings) collapse into one result
+    # that each retriever votes for once, at its best rank
+    sparse_docs = [Document(page_content=index.documents[row], metadata=index.metadatas[row]) for row, _ in sparse]
+    fused, docs = {}, {}
+    for ranked in (dense, sparse_docs):
+        seen = set()
+        for rank, doc in enumerate(ranked):
+            key = (doc.page_content, doc.metadata.get("symbol"), doc.metadata.get("date"))
+            if key in seen:
+                continue
+            seen.add(key)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            docs.setdefault(key, doc)
+    # Documents about a stock the query names count as a first-place vote of their own
+    for key, doc in docs.items():
+        if doc.metadata.get("symbol") in symbols:
+            fused[key] += 1.0 / (RRF_K + 1)
+    best = sorted(fused, key=fused.get, reverse=True)[:k]
+    return [docs[key] for key in best]
@@ -1,118 +1,66 @@
 import os
-import time
 import json
-import pandas as pd
+import asyncio
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from src.database import save_market_stats, log_ingestion
-from src.vector_store import add_documents
+from src.database import save_market_stats, save_option_chain, log_ingestion, bump_snapshot_version
+from src.forecasting import refresh_forecasts
+from src.pdf_ingestion import ingest_pdfs, PDF_INGESTION_ENABLED
+from src.option_chain import analyze_option_chain, format_option_chain_summary
+from src.cache import answer_cache
+from src.jobs import IngestionJob
+from src.nse_client import nse_session, record_fixture
+from src.vector_store import add_documents, embed_documents, make_document_id, prune_snapshots
 from langchain_core.documents import Document
-import yfinance as yf  # Fallback
 
 # --- CONFIGURATION ---
 DATA_DIR = "./data"
 os.makedirs(DATA_DIR, exist_ok=True)
 
-def get_driver():
-    """Initializes a Stealth Chrome Driver to bypass NSE Bot Detection."""
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")  # Run in background
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-    # Real User-Agent is CRITICAL for NSE
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    
-    service = Service(ChromeDriverManager().install())
-    return webdriver.Chrome(service=service, options=chrome_options)
-
-def fetch_nse_api_data(driver, api_url, referer_url):
-    """
-    Fetches JSON data from NSE's internal APIs using Selenium's valid cookies.
-    This mimics clicking the 'Download' button.
-    """
+def parse_trading_date(timestamp):
+    """NSE timestamps look like '17-Oct-2026 15:30:00'; falls back to today."""
     try:
-        # 1. Load the page first to establish the Session/Cookies
-        print(f"Connecting to NSE Session via {referer_url}...")
-        driver.get(referer_url)
-        time.sleep(3) # Wait for cookies to set
-
-        # 2. Use JavaScript to fetch the data using the browser's valid session
-        # This bypasses the headers check that blocks standard Python 'requests'
-        script = f"""
-            var callback = arguments[arguments.length - 1];
-            fetch('{api_url}', {{ 
-                headers: {{ 'X-Requested-With': 'XMLHttpRequest' }} 
-            }})
-            .then(response => response.json())
-            .then(data => callback(data))
-            .catch(err => callback(null));
-        """
-        print(f"Fetching API: {api_url}")
-        data = driver.execute_async_script(script)
-        return data
-    except Exception as e:
-        print(f"API Fetch Error: {e}")
-        return None
+        return datetime.strptime(str(timestamp).split(" ")[0], "%d-%b-%Y").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return datetime.now().strftime("%Y-%m-%d")
 
-def process_market_stats(driver):
-    """Scrapes Nifty 50 Stock Prices (Infosys, Reliance, etc.)"""
-    # The API endpoint for the Nifty 50 Table
-    api_url = "https://www.nseindia.com/api/equity-stockIndices?index=NIFTY%2050"
-    referer = "https://www.nseindia.com/market-data/live-equity-market?symbol=NIFTY%2050"
-    
-    data = fetch_nse_api_data(driver, api_url, referer)
+def process_market_stats(data):
+    """Normalizes the Nifty 50 Stock Prices (Infosys, Reliance, etc.) from the equity-stockIndices API."""
     records = []
     
     if data and 'data' in data:
         print(f"SUCCESS: Fetched valid JSON data from NSE.")
+        trading_date = parse_trading_date(data.get('timestamp'))
         # NSE JSON structure: {'data': [{'symbol': 'INFY', 'lastPrice': 1600...}, ...]}
         for item in data['data']:
             try:
                 # Normalizing the keys
                 records.append({
                     "SYMBOL": item.get('symbol'),
+                    "COMPANY": (item.get('meta') or {}).get('companyName'),
                     "OPEN": item.get('open'),
                     "HIGH": item.get('dayHigh'),
                     "LOW": item.get('dayLow'),
                     "LTP": item.get('lastPrice'),
                     "%CHNG": item.get('pChange'),
-                    "VOLUME": item.get('totalTradedVolume')
+                    "VOLUME": item.get('totalTradedVolume'),
+                    "DATE": trading_date
                 })
             except:
                 continue
     return records
 
-def process_option_chain(driver):
-    """Scrapes Option Chain Data (Just the summary for RAG context)."""
-    api_url = "https://www.nseindia.com/api/option-chain-indices?symbol=NIFTY"
-    referer = "https://www.nseindia.com/option-chain"
-    
-    data = fetch_nse_api_data(driver, api_url, referer)
-    summary_text = ""
-    
-    if data and 'records' in data:
-        # Just grab the timestamp and underlying value for context
-        timestamp = data['records'].get('timestamp')
-        nifty_val = data['records'].get('underlyingValue')
-        summary_text = f"Nifty 50 Option Chain Status ({timestamp}): Underlying Index Value is {nifty_val}. "
-        
-        # Grab a few ATM strikes (simple heuristic: middle of the data array)
-        if 'data' in data['records']:
-            chain = data['records']['data']
-            mid_point = len(chain) // 2
-            # Take 5 rows from the middle
-            for i in range(mid_point - 2, mid_point + 3):
-                row = chain[i]
-                strike = row.get('strikePrice')
-                ce_ltp = row.get('CE', {}).get('lastPrice', 0)
-                pe_ltp = row.get('PE', {}).get('lastPrice', 0)
-                summary_text += f"[Strike: {strike}, Call Price: {ce_ltp}, Put Price: {pe_ltp}] "
-    
-    return summary_text
+def process_option_chain(data):
+    """
+    Loads the full option-chain-indices response (every strike and expiry) and
+    computes PCR, max pain, ATM strike and OI build-up from it.
+    Returns (analytics, rows) or (None, []) if the payload has no chain.
+    """
+    frame, analytics = analyze_option_chain(data)
+    if analytics is None:
+        return None, []
+    analytics["date"] = parse_trading_date(analytics.get("timestamp"))
+    rows = frame.drop(columns=["expiry_date"]).to_dict("records")
+    return analytics, rows
 
 def fetch_fallback_data():
     """Uses Yahoo Finance if NSE blocks us."""
@@ -120,7 +68,9 @@ def fetch_fallback_data():
     tickers = ["INFY.NS", "RELIANCE.NS", "TCS.NS", "HDFCBANK.NS", "ICICIBANK.NS", "SBIN.NS", "BHARTIARTL.NS", "ITC.NS"]
     records = []
     try:
+        import yfinance as yf  # Loaded only when the fallback is actually needed
         data = yf.download(tickers, period="1d", progress=False)
+        trading_date = data.index[-1].strftime("%Y-%m-%d") if len(data.index) else datetime.now().strftime("%Y-%m-%d")
         # Process multi-index dataframe
         for ticker in tickers:
             sym = ticker.replace('.NS', '')
@@ -136,58 +86,136 @@ def fetch_fallback_data():
                     "LTP": round(float(ltp), 2),
                     "OPEN": round(float(open_val), 2),
                     "%CHNG": round(float(pct_chng), 2),
-                    "VOLUME": int(vol)
+                    "VOLUME": int(vol),
+                    "DATE": trading_date
                 })
             except:
                 continue
         print(f"SUCCESS: Retrieved {len(records)} stocks from Yahoo Finance.")
+        record_fixture("fallback", records)
     except Exception as e:
         print(f"Fallback Error: {e}")
     return records
 
-async def scrape_nse_data():
-    """Main Orchestrator."""
+def _log_job(job):
+    """Persist the run with per-stage duration and record counts."""
+    info = job.to_dict()
+    log_ingestion({
+        "job_id": job.id,
+        "trigger": job.trigger,
+        "status": job.status,
+        "error": job.error,
+        "timestamp": datetime.now(),
+        "duration_ms": job.duration_ms,
+        "stages": [{k: v for k, v in st.items() if k != "started_at"} for st in info["stages"]],
+    })
+
+async def scrape_nse_data(job=None):
+    """
+    Main Orchestrator.
+    NSE APIs are fetched concurrently over the shared async session; Mongo and
+    Chroma calls are blocking, so those stages run in a worker thread.
+    """
     print("Starting Ingestion Pipeline...")
-    driver = get_driver()
+    if job is None:
+        job = IngestionJob(trigger="direct")
+        job.start()
     all_docs = []
+    all_ids = []
     market_records = []
+    oc_analytics = None
     
     try:
-        # --- 1. MARKET STATS (The Priority) ---
-        print("Attempting to fetch Market Stats...")
-        market_records = process_market_stats(driver)
+        # --- 1. FETCH (all NSE endpoints at once, reusing the session cookies) ---
+        print("Attempting to fetch Market Stats and Option Chain...")
+        with job.stage("nse_fetch") as stage:
+            payloads = await nse_session.fetch_endpoints(["market_stats", "option_chain"])
+            stage["records"] = sum(1 for data in payloads.values() if data)
+
+        # --- 2. MARKET STATS (The Priority) ---
+        with job.stage("normalize") as stage:
+            market_records = process_market_stats(payloads["market_stats"])
+            oc_analytics, oc_rows = process_option_chain(payloads["option_chain"])
+            stage["records"] = len(market_records) + len(oc_rows)
         
         # If NSE failed (empty list), trigger Fallback
         if not market_records:
-            market_records = fetch_fallback_data()
+            with job.stage("fallback") as stage:
+                market_records = await asyncio.to_thread(fetch_fallback_data)
+                stage["records"] = len(market_records)
             
-        # --- 2. OPTION CHAIN ---
-        # (Optional: Only if NSE didn't block us on the first call)
-        if market_records: 
-            oc_text = process_option_chain(driver)
-            if oc_text:
-                all_docs.append(Document(page_content=oc_text, metadata={"source": "NSE", "type": "Option Chain"}))
+        # --- 3. OPTION CHAIN ---
+        # Numbers live in Mongo for the option-chain tool; RAG only gets a short summary
+        if market_records and oc_analytics:
+            oc_date = oc_analytics["date"]
+            all_docs.append(Document(page_content=format_option_chain_summary(oc_analytics), metadata={
+                "source": "NSE", "type": "Option Chain", "symbol": "NIFTY",
+                "company": "Nifty 50 Index Options", "date": oc_date, "day": int(oc_date.replace("-", ""))
+            }))
+            all_ids.append(make_document_id("NSE", "Option Chain", "NIFTY", oc_date))
 
-        # --- 3. SAVE DATA ---
+        # --- 4. SAVE DATA ---
         if market_records:
             # A. Save for "Top Gainers" Tools (MongoDB)
-            save_market_stats(market_records)
+            with job.stage("mongo_write") as stage:
+                await asyncio.to_thread(save_market_stats, market_records)
+                if oc_analytics:
+                    await asyncio.to_thread(save_option_chain, oc_analytics, oc_rows)
+                stage["records"] = len(market_records) + (len(oc_rows) if oc_analytics else 0)
             
             # B. Save for Chatbot Questions "Price of Infosys" (Vector DB)
             for r in market_records:
                 # We create a clear sentence so the LLM can read it easily
                 text = f"Stock Update: {r['SYMBOL']}. Current Price (LTP): {r['LTP']}. Percentage Change: {r['%CHNG']}%. Volume: {r['VOLUME']}."
-                all_docs.append(Document(page_content=text, metadata={"source": "market_live", "type": "stock_price"}))
+                all_docs.append(Document(page_content=text, metadata={
+                    "source": "market_live", "type": "stock_price", "symbol": r['SYMBOL'],
+                    "company": r.get('COMPANY') or "", "date": r['DATE'], "day": int(r['DATE'].replace("-", ""))
+                }))
+                all_ids.append(make_document_id("market_live", "stock_price", r['SYMBOL'], r['DATE']))
             
-            # Add to ChromaDB
-            add_documents(all_docs)
-            print(f"✅ Pipeline Success: Ingested {len(all_docs)} documents.")
+            with job.stage("embed") as stage:
+                embeddings = await asyncio.to_thread(embed_documents, all_docs, stats=stage)
+                stage["records"] = len(embeddings)
+
+            # Upsert into ChromaDB (same symbol + trading date overwrites), then drop superseded snapshots
+            with job.stage("vector_upsert") as stage:
+                await asyncio.to_thread(add_documents, all_docs, all_ids, embeddings)
+                await asyncio.to_thread(prune_snapshots, "stock_price", market_records[0]['DATE'])
+                if oc_analytics:
+                    await asyncio.to_thread(prune_snapshots, "Option Chain", oc_date)
+                stage["records"] = len(all_docs)
+
+        # --- 5. PDFS ---
+        # Independent of market data: filings still arrive on days NSE and the fallback return nothing
+        pdf_error, pdf_chunks = None, 0
+        if PDF_INGESTION_ENABLED:
+            try:
+                # Only new or changed files under PDF_DATA_DIR are parsed
+                with job.stage("pdf_ingest") as stage:
+                    pdf_chunks = (await asyncio.to_thread(ingest_pdfs, stats=stage))["chunks"]
+            except Exception as e:
+                print(f"PDF Ingestion Error: {e}")
+                pdf_error = f"PDF ingestion failed: {e}"
+
+        if market_records:
+            # Publish the new snapshot; cached answers from older data are now unreachable
+            version = await asyncio.to_thread(bump_snapshot_version)
+            answer_cache.invalidate()
+            # Model work happens here, once per ingestion, so predictions in chat are a lookup
+            with job.stage("forecast") as stage:
+                stage["records"] = await asyncio.to_thread(refresh_forecasts, version)
+            print(f"✅ Pipeline Success: Ingested {len(all_docs)} documents (snapshot v{version}).")
+            job.finish("failed" if pdf_error else "success", pdf_error)
         else:
+            if pdf_chunks:
+                # No new snapshot to version cached answers by, but they may predate the new filings
+                answer_cache.invalidate()
             print("❌ Pipeline Failed: No data collected from Primary or Backup sources.")
-            
-        log_ingestion({"status": "success" if market_records else "failed", "timestamp": datetime.now()})
+            job.finish("failed", "No market data collected from Primary or Backup sources."
+                       + (f" {pdf_error}" if pdf_error else f" PDFs ingested: {pdf_chunks} chunks."))
         
     except Exception as e:
         print(f"Critical Error: {e}")
+        job.finish("failed", str(e))
     finally:
-        driver.quit()
\ No newline at end of file
+        await asyncio.to_thread(_log_job, job)
@@ -12,6 +12,7 @@ from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 from langchain_core.documents import Document
 from src.vector_store import add_documents
+from src.pdf_ingestion import ingest_pdfs
 
 DOWNLOAD_DIR = os.path.abspath("./data")
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
@@ -106,16 +107,9 @@ def scrape_nse_data():
     else:
         print("No data collected.")
 
-    # --- PDF SIMULATION ---
+    # --- PDF ANNOUNCEMENTS ---
     print("Checking for PDF announcements...")
-    dummy_pdf_path = os.path.join(DATA_DIR, "reliance_announcement.pdf")
-    if not os.path.exists(dummy_pdf_path):
-         with open(dummy_pdf_path.replace(".pdf", ".txt"), "w") as f:
-            f.write("RELIANCE INDUSTRIES: Board meeting scheduled for Dividend on 2026-01-22.")
-    
-    with open(dummy_pdf_path.replace(".pdf", ".txt"), "r") as f:
-        text = f.read()
-    add_documents([Document(page_content=text, metadata={"source": "RELIANCE", "type": "pdf"})])
+    ingest_pdfs(DOWNLOAD_DIR)
 
     log_ingestion({"status": "success", "timestamp": datetime.now()})
     print("Pipeline Complete.")
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from langchain.agents.middleware import before_model
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+# --- CONFIGURATION ---
+# Conversations kept per worker; the least recently used one is dropped beyond this
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+# Earlier turns (question + answer) kept per conversation
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "10"))
+# Approximate token budget for the messages sent to the LLM (the system prompt and tool schemas come on top)
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "4000"))
+# Tool outputs of the current turn are cut to this many characters when the budget is exceeded
+SESSION_TOOL_OUTPUT_CHARS = int(os.getenv("SESSION_TOOL_OUTPUT_CHARS", "2000"))
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    In-memory LangGraph checkpointer with bounded memory.
+    Only the latest checkpoint of a conversation is kept (chat never rewinds), and
+    beyond max_sessions the least recently used conversation is dropped.
+    """
+
+    def __init__(self, max_sessions=SESSION_MAX_SESSIONS):
+        super().__init__()
+        self.max_sessions = max_sessions
+        self._recent = OrderedDict()   # thread_id -> None, in LRU order
+        self._versions = {}            # (thread_id, checkpoint_ns) -> {channel: version} of the kept checkpoint
+        self._lock = threading.RLock()
+
+    def _touch(self, thread_id):
+        self._recent[thread_id] = None
+        self._recent.move_to_end(thread_id)
+        while len(self._recent) > self.max_sessions:
+            self.delete_thread(next(iter(self._recent)))
+
+    def has_thread(self, thread_id):
+        with self._lock:
+            return thread_id in self._recent
+
+    def get_tuple(self, config):
+        with self._lock:
+            saved = super().get_tuple(config)
+            thread_id = config["configurable"]["thread_id"]
+            if saved is not None:
+                self._touch(thread_id)
+            elif not self.storage.get(thread_id):
+                self.storage.pop(thread_id, None)  # the base class leaves an empty entry behind
+            return saved
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            saved = super().put(config, checkpoint, metadata, new_versions)
+            # Drop the older checkpoints, their pending writes and the channel values they alone referenced
+            checkpoints = self.storage[thread_id][checkpoint_ns]
+            for checkpoint_id in [c for c in checkpoints if c != checkpoint["id"]]:
+                del checkpoints[checkpoint_id]
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            serialized, saved_metadata, _ = checkpoints[checkpoint["id"]]
+            checkpoints[checkpoint["id"]] = (serialized, saved_metadata, None)
+            versions = self._versions.setdefault((thread_id, checkpoint_ns), {})
+            for channel, version in new_versions.items():
+                old = versions.get(channel)
+                if old is not None and old != version:
+                    self.blobs.pop((thread_id, checkpoint_ns, channel, old), None)
+                versions[channel] = version
+            self._touch(thread_id)
+            return saved
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id):
+        # Same as the base class, but without scanning every conversation's writes and blobs
+        with self._lock:
+            self._recent.pop(thread_id, None)
+            for checkpoint_ns, checkpoints in self.storage.pop(thread_id, {}).items():
+                for checkpoint_id in checkpoints:
+                    self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                for channel, version in self._versions.pop((thread_id, checkpoint_ns), {}).items():
+                    self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+
+# Shared by every agent run of this worker
+checkpointer = BoundedMemorySaver()
+
+def _truncate(message, limit):
+    content = message.content
+    if not isinstance(content, str) or len(content) <= limit:
+        return message
+    # The result, marker included, fits in limit, so truncating again is a no-op
+    marker = "\n[... truncated {} characters]"
+    kept = max(limit - len(marker.format(len(content))), 0)
+    return message.model_copy(update={"content": content[:kept] + marker.format(len(content) - kept)})
+
+def compact_messages(messages, max_turns=SESSION_MAX_TURNS, token_budget=SESSION_TOKEN_BUDGET,
+                     tool_output_chars=SESSION_TOOL_OUTPUT_CHARS):
+    """
+    Bounds a conversation before it is sent to the LLM:
+    earlier turns shrink to their question and final answer (tool calls and outputs dropped),
+    at most max_turns of them are kept, and the oldest go first while over token_budget.
+    The current turn is always kept; its tool outputs are truncated only if it alone is over budget.
+    """
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    if not turns:
+        return messages
+
+    history = []
+    for turn in turns[:-1]:
+        answers = [m for m in turn if isinstance(m, AIMessage) and not m.tool_calls and m.content]
+        history.append(turn[:1] + answers[-1:])
+    history = history[-max_turns:] if max_turns > 0 else []
+    current = turns[-1]
+
+    current_tokens = count_tokens_approximately(current)
+    if current_tokens > token_budget:
+        current = [_truncate(m, tool_output_chars) if isinstance(m, ToolMessage) else m for m in current]
+        current_tokens = count_tokens_approximately(current)
+    turn_tokens = [count_tokens_approximately(turn) for turn in history]
+    while history and current_tokens + sum(turn_tokens) > token_budget:
+        history.pop(0)
+        turn_tokens.pop(0)
+
+    compacted = [m for turn in history for m in turn] + current
+    if len(compacted) == len(messages) and all(a is b for a, b in zip(compacted, messages)):
+        return messages
+    return compacted
+
+@before_model
+def compact_history(state, runtime):
+    """Agent middleware: rewrites the stored conversation to its compacted form before each LLM call."""
+    messages = state["messages"]
+    compacted = compact_messages(messages)
+    if compacted is messages:
+        return None
+    return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *compacted]}
+
+# One lock per active session; an entry goes away once no request holds it
+_session_locks = weakref.WeakValueDictionary()
+
+def session_lock(session_id):
+    """Serializes the turns of one conversation (concurrent runs on one thread would interleave their messages)."""
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = _session_locks[session_id] = asyncio.Lock()
+    return lock
+
+def session_config(session_id, **config):
+    return {**config, "configurable": {"thread_id": session_id}}
+
+async def record_turn(agent, session_id, query, answer):
+    """Appends a turn answered without the agent (fast path / cache), so follow-up questions can refer to it."""
+    config = session_config(session_id)
+    state = await agent.aget_state(config)
+    messages = list(state.values.get("messages", [])) + [HumanMessage(query), AIMessage(answer)]
+    # The next agent run would compact anyway; doing it here keeps fast-path-only sessions bounded too
+    compacted = compact_messages(messages)
+    await agent.aupdate_state(config, {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *compacted]}, as_node="model")
@@ -1,59 +1,119 @@
 from langchain.tools import tool
-from src.database import get_market_stats
-from src.vector_store import get_vector_store
-import random
+from src.market_snapshot import get_market_snapshot, METRICS
+from src.database import get_price_history, get_option_chain_analytics as load_option_chain_analytics
+from src.option_chain import format_option_chain_summary
+from src.forecasting import get_forecast, format_forecast
+from src.fast_path import get_symbol_index
+from src.retrieval import hybrid_search, parse_filters
+from src.prefetch import take_prefetched
 
 @tool
-def search_market_documents(query: str):
+def search_market_documents(query: str, k: int = 3, symbol: str = "", doc_type: str = "", date: str = ""):
     """
     Searches for corporate announcements, reports, and specific stock news.
     Useful when you need to find qualitative info about a company.
+    Narrow the search with symbol (e.g. "INFY" or "INFY,TCS"), doc_type ("stock_price",
+    "Option Chain", "pdf") or date ("YYYY-MM-DD"); k is the number of chunks returned (max 10).
     """
-    retriever = get_rag_retriever_tool()
-    docs = retriever.invoke(query)
-    
+    k = max(1, min(int(k or 3), 10))
+    filters = parse_filters(symbol=symbol, doc_type=doc_type, date=date)
+    docs = hybrid_search(query, k=k, filters=filters)
+    if not docs and filters:
+        return f"No documents matched the filters {filters}."
+
     # Format the documents into a string for the LLM
-    return "\n\n".join([f"[Source: {d.metadata.get('source', 'Unknown')}] {d.page_content}" for d in docs])
+    return "\n\n".join([f"[Source: {d.metadata.get('source', 'Unknown')}"
+                         + (f" | {d.metadata['symbol']}" if d.metadata.get('symbol') else "")
+                         + (f" | {d.metadata['date']}" if d.metadata.get('date') else "")
+                         + f"] {d.page_content}" for d in docs])
 
 @tool
-def get_top_gainers_losers(query: str):
+def get_top_gainers_losers(query: str, metric: str = "", n: int = 5):
     """
-    Useful for answering questions about top gainers, losers, or worst performers.
-    Returns a list of top 5 and bottom 5 stocks from the latest scrape.
+    Useful for answering questions about top gainers, losers, or worst performers,
+    most/least traded stocks (metric="volume") or biggest intraday swings (metric="range").
+    Returns the top n and bottom n stocks from the latest scrape.
     """
-    data = get_market_stats()
-    if not data:
+    snapshot = take_prefetched("market_snapshot")
+    if snapshot is None:
+        snapshot = get_market_snapshot()
+    if not len(snapshot):
         return "No market data available. Please run the ingestion pipeline."
-    
-    # Sort by % Change (assuming string needs conversion)
-    # Ensure LTP and %CHNG are floats
-    for d in data:
-        try:
-            d['%CHNG'] = float(str(d['%CHNG']).replace(',', ''))
-        except:
-            d['%CHNG'] = 0.0
-
-    sorted_data = sorted(data, key=lambda x: x['%CHNG'], reverse=True)
-    
-    top_5 = sorted_data[:5]
-    bottom_5 = sorted_data[-5:]
-    
-    return f"Top Gainers: {[x['SYMBOL'] + ' (' + str(x['%CHNG']) + '%)' for x in top_5]}\n" \
-           f"Top Losers: {[x['SYMBOL'] + ' (' + str(x['%CHNG']) + '%)' for x in bottom_5]}"
+
+    metric = metric.lower() if metric.lower() in METRICS else _metric_from_query(query)
+    n = max(1, min(int(n or 5), 25))
+    top, bottom = snapshot.rank(metric, n)
+
+    if metric == "volume":
+        return f"Most Traded (Volume): {[s + ' (' + format(int(v), ',') + ')' for s, v in top]}\n" \
+               f"Least Traded (Volume): {[s + ' (' + format(int(v), ',') + ')' for s, v in bottom]}"
+    if metric == "range":
+        return f"Widest Intraday Range (% of open): {[s + ' (' + str(round(v, 2)) + '%)' for s, v in top]}\n" \
+               f"Narrowest Intraday Range (% of open): {[s + ' (' + str(round(v, 2)) + '%)' for s, v in bottom]}"
+    return f"Top Gainers: {[s + ' (' + str(round(v, 2)) + '%)' for s, v in top]}\n" \
+           f"Top Losers: {[s + ' (' + str(round(v, 2)) + '%)' for s, v in bottom]}"
+
+def _metric_from_query(query):
+    text = query.lower()
+    if any(w in text for w in ("volume", "traded", "active", "liquid")):
+        return "volume"
+    if any(w in text for w in ("range", "volatile", "swing", "high-low", "high low")):
+        return "range"
+    return "change"
+
+@tool
+def get_stock_price_history(query: str, days: int = 30):
+    """
+    Useful for questions about how a stock moved over a period, e.g. "INFY over the last 30 days".
+    Pass the stock name or symbol in the query. Returns daily closing prices from stored scrapes.
+    """
+    symbols = get_symbol_index().match(query)
+    if not symbols:
+        return "Could not identify a Nifty 50 stock in the query."
+    days = max(1, min(int(days or 30), 365))
+
+    lines = []
+    for symbol in symbols[:3]:
+        samples = get_price_history(symbol, days)
+        # Last sample of each trading day is that day's close
+        closes = {}
+        for row in samples:
+            if row.get('ltp') is not None:
+                closes[row.get('date') or row['timestamp'].strftime("%Y-%m-%d")] = row['ltp']
+        if not closes:
+            lines.append(f"{symbol}: no price history stored for the last {days} days.")
+            continue
+        first, last = list(closes.values())[0], list(closes.values())[-1]
+        change = (last - first) / first * 100 if first else 0.0
+        lines.append(
+            f"{symbol} over the last {days} days ({len(closes)} trading days): "
+            f"from {first} to {last} ({change:+.2f}%), high {max(closes.values())}, low {min(closes.values())}. "
+            f"Daily closes: {closes}"
+        )
+    return "\n".join(lines)
+
+@tool
+def get_option_chain_analytics(query: str):
+    """
+    Useful for derivatives questions about the Nifty option chain: put-call ratio (PCR),
+    max pain, ATM strike and straddle price, implied volatility, support/resistance
+    from open interest and OI build-up. Returns precomputed numbers from the latest scrape.
+    """
+    analytics = load_option_chain_analytics("NIFTY")
+    if not analytics:
+        return "No option chain data available. Please run the ingestion pipeline."
+    return format_option_chain_summary(analytics) + f" (computed over {analytics['strikes']} strikes, {analytics['expiries']} expiries)"
 
 @tool
 def predict_stock_price(query: str):
     """
     Useful for predicting stock prices or market movement for tomorrow.
-    Note: This is a heuristic/dummy prediction tool.
-    """
-    # Simple Random Heuristic
-    move = random.choice(["up", "down", "sideways"])
-    percent = round(random.uniform(0.5, 3.0), 2)
-    return f"Based on heuristic market sentiment analysis, the stock/market is likely to move {move} by approximately {percent}% tomorrow. (Disclaimer: Not financial advice)."
-
-# RAG Retriever Tool
-def get_rag_retriever_tool():
-    vector_store = get_vector_store()
-    retriever = vector_store.as_retriever(search_kwargs={"k": 3})
-    return retriever
\ No newline at end of file
+    Pass the stock name or symbol in the query ("market"/"Nifty" for the index).
+    Returns the precomputed next-session forecast with a 95% confidence interval.
+    """
+    symbols = get_symbol_index().match(query) or ["NIFTY 50"]
+    lines = []
+    for symbol in symbols[:3]:
+        forecast = get_forecast(symbol)
+        lines.append(format_forecast(forecast) if forecast else f"{symbol}: no forecast available, no closing prices are stored for it yet.")
+    return "\n".join(lines) + " (Disclaimer: Statistical estimate from past prices, not financial advice.)"
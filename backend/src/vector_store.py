@@ -1,21 +1,175 @@
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings # <--- Changed
 import os
+import uuid
+import numpy as np
+import threading
+from datetime import datetime, timedelta
+from src.batching import current_batch
+from src.embedding_cache import EmbeddingCache
+from src.embeddings import EMBED_BATCH_SIZE, create_embeddings, embedding_id
+from src.metrics import timed
 
 PERSIST_DIRECTORY = "./chroma_db"
+COLLECTION_NAME = "nifty_data"
+# How many trading days of market snapshots (stock prices, option chain) to keep
+SNAPSHOT_RETENTION_DAYS = int(os.getenv("SNAPSHOT_RETENTION_DAYS", "1"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+
+# --- Process-wide singletons ---
+# Loading the embedding model takes seconds, so it is created once
+# per process and shared by every retriever / ingestion call.
+_lock = threading.Lock()
+_embedding_function = None
+_vector_store = None
+_embedding_cache = None
+_warm = False
+# Bumped on every write from this process so derived indexes (src/retrieval.py) know to rebuild
+_generation = 0
+
+def get_embedding_function():
+    global _embedding_function
+    if _embedding_function is None:
+        with _lock:
+            if _embedding_function is None:
+                # Backend, quantization, threads and batch size come from EMBEDDING_* settings (src/embeddings.py)
+                _embedding_function = create_embeddings()
+    return _embedding_function
+
+def get_embedding_cache():
+    """Persistent content-hash -> vector cache for the current model and backend (None if disabled)."""
+    global _embedding_cache
+    if EMBEDDING_CACHE_ENABLED and _embedding_cache is None:
+        with _lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(embedding_id())
+    return _embedding_cache
 
 def get_vector_store():
-    # Use a standard, efficient open-source embedding model running locally
-    embedding_function = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    
-    vector_store = Chroma(
-        collection_name="nifty_data",
-        embedding_function=embedding_function,
-        persist_directory=PERSIST_DIRECTORY
-    )
-    return vector_store
-
-def add_documents(documents):
+    global _vector_store
+    if _vector_store is None:
+        embedding_function = get_embedding_function()
+        with _lock:
+            if _vector_store is None:
+                from langchain_chroma import Chroma
+                _vector_store = Chroma(
+                    collection_name=COLLECTION_NAME,
+                    embedding_function=embedding_function,
+                    persist_directory=PERSIST_DIRECTORY
+                )
+    return _vector_store
+
+def warmup_vector_store():
+    """Loads the model and Chroma client and runs one dummy query so the first chat is not slow."""
+    global _warm
+    vs = get_vector_store()
+    vs.similarity_search("Nifty 50 warmup", k=1)
+    _warm = True
+    print("Vector store warmed up.")
+
+def is_warm():
+    return _warm
+
+def get_generation():
+    """Number of writes this process has made to the collection."""
+    return _generation
+
+def _changed():
+    global _generation
+    with _lock:
+        _generation += 1
+
+def make_document_id(source, doc_type, symbol, trading_date):
+    """Stable ID so re-ingesting the same snapshot overwrites instead of appending."""
+    return f"{source}:{doc_type}:{symbol}:{trading_date}".replace(" ", "_")
+
+def embed_query(text):
+    """Query-side embedding, shared by every search path so it can be batched or swapped in one place."""
+    batch = current_batch()
+    if batch is not None:
+        # Inside /chat/batch: wait briefly and embed together with the other questions' searches
+        return batch.embed_query(text, embed_queries)
+    with timed("embedding", "query"):
+        return get_embedding_function().embed_query(text)
+
+def embed_queries(texts):
+    """Several queries in one model call (this model encodes queries and documents the same way)."""
+    with timed("embedding", "queries"):
+        return get_embedding_function().embed_documents(texts)
+
+def embed_documents(documents, batch_size=EMBED_BATCH_SIZE, stats=None):
+    """
+    Embeds page contents, reusing cached vectors for text that was embedded before.
+    Only cache misses go through the model, in batches of `batch_size`.
+    Kept separate from the upsert so ingestion can time both.
+    """
+    texts = [d.page_content for d in documents]
+    cache = get_embedding_cache()
+    vectors = cache.get_many(texts) if cache else [None] * len(texts)
+    misses = [i for i, v in enumerate(vectors) if v is None]
+
+    embedding_function = get_embedding_function() if misses else None
+    for start in range(0, len(misses), batch_size):
+        batch = misses[start:start + batch_size]
+        with timed("embedding", "documents"):
+            new_vectors = embedding_function.embed_documents([texts[i] for i in batch])
+        if cache:
+            cache.put_many([texts[i] for i in batch], new_vectors)
+        for i, vector in zip(batch, new_vectors):
+            vectors[i] = vector
+
+    hits = len(texts) - len(misses)
+    if stats is not None:
+        stats["cache_hits"] = hits
+        stats["cache_misses"] = len(misses)
+    if texts:
+        print(f"Embedding cache: {hits}/{len(texts)} hits ({hits / len(texts):.0%}), embedded {len(misses)}.")
+    return [np.asarray(v, dtype=np.float32).tolist() for v in vectors]
+
+def add_documents(documents, ids=None, embeddings=None):
     vs = get_vector_store()
-    vs.add_documents(documents)
-    print(f"Added {len(documents)} chunks to Vector DB.")
\ No newline at end of file
+    if not documents:
+        return
+    if embeddings is None:
+        embeddings = embed_documents(documents)
+    ids = ids or [str(uuid.uuid4()) for _ in documents]
+    # Chroma rejects duplicate IDs inside one upsert, last one wins
+    unique = {doc_id: (doc, vector) for doc_id, doc, vector in zip(ids, documents, embeddings)}
+    # Upsert: existing entries with the same ID are replaced
+    with timed("chroma", "upsert"):
+        vs._collection.upsert(
+            ids=list(unique.keys()),
+            embeddings=[vector for _, vector in unique.values()],
+            metadatas=[doc.metadata or None for doc, _ in unique.values()],
+            documents=[doc.page_content for doc, _ in unique.values()],
+        )
+    _changed()
+    print(f"Added {len(unique)} chunks to Vector DB.")
+
+def delete_documents(where):
+    vs = get_vector_store()
+    with timed("chroma", "delete"):
+        existing = vs.get(where=where, include=[])
+        if existing["ids"]:
+            vs.delete(ids=existing["ids"])
+            _changed()
+    return len(existing["ids"])
+
+def prune_snapshots(doc_type, trading_date, retention_days=SNAPSHOT_RETENTION_DAYS):
+    """
+    Deletes snapshot documents of `doc_type` older than the retention window.
+    Documents without a 'day' field predate stable IDs and are always superseded.
+    """
+    vs = get_vector_store()
+    latest = datetime.strptime(trading_date, "%Y-%m-%d")
+    cutoff = int((latest - timedelta(days=retention_days - 1)).strftime("%Y%m%d"))
+
+    with timed("chroma", "prune"):
+        existing = vs.get(where={"type": doc_type}, include=["metadatas"])
+        stale = [
+            doc_id for doc_id, meta in zip(existing["ids"], existing["metadatas"])
+            if (meta or {}).get("day", 0) < cutoff
+        ]
+        if stale:
+            vs.delete(ids=stale)
+            _changed()
+        print(f"Pruned {len(stale)} stale '{doc_type}' snapshots from Vector DB.")
+    return len(stale)
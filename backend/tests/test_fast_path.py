@@ -0,0 +1,56 @@
+import pytest
+from src import fast_path
+from src.market_snapshot import MarketSnapshot
+
+RECORDS = [
+    {"SYMBOL": "INFY", "COMPANY": "Infosys Limited", "LTP": "1,500.50", "%CHNG": "1.2", "VOLUME": "1000", "DATE": "2026-10-16"},
+    {"SYMBOL": "RELIANCE", "COMPANY": "Reliance Industries Limited", "LTP": "2900", "%CHNG": "-0.8", "VOLUME": "2000"},
+    {"SYMBOL": "HDFCBANK", "COMPANY": "HDFC Bank Limited", "LTP": "1650", "%CHNG": "0.4", "VOLUME": "3000"},
+    {"SYMBOL": "TECHM", "COMPANY": "Tech Mahindra Limited", "LTP": "1450", "%CHNG": "-0.2", "VOLUME": "500"},
+    {"SYMBOL": "COALINDIA", "COMPANY": "Coal India Limited", "LTP": "390", "%CHNG": "-0.5", "VOLUME": "800"},
+    {"SYMBOL": "NIFTY 50", "LTP": "25000", "%CHNG": "0.3"},
+]
+
+@pytest.fixture(autouse=True)
+def snapshot(monkeypatch):
+    monkeypatch.setattr(fast_path, "FAST_PATH_ENABLED", True)
+    monkeypatch.setattr(fast_path, "get_market_snapshot", lambda: MarketSnapshot(RECORDS, version=1))
+
+# Each of these would get today's quote or the index-wide list if classified as simple
+FALL_THROUGH = [
+    "What was INFY's price yesterday?",
+    "Reliance all-time high price",
+    "price of INFY on 2026-01-05",
+    "INFY share price on 5th January",
+    "INFY price 3 days ago",
+    "Infosys last close price",
+    "What is the 52 week high of HDFC Bank?",
+    "Reliance target price",
+    "Top 5 gainers among bank stocks",
+    "top IT gainers today",
+    "top gainers in the pharma sector",
+    "Will INFY price go up tomorrow?",
+    "Compare price of INFY and Reliance",
+    "Is INFY among the top gainers?",
+    # Generic words that also start a company name are not that company
+    "price of tech stocks",
+    "what is the coal price today",
+]
+
+@pytest.mark.parametrize("query", FALL_THROUGH)
+def test_falls_through_to_agent(query):
+    assert fast_path.try_fast_path(query) is None
+
+@pytest.mark.parametrize("query, expected", [
+    ("What is the price of Infosys?", "INFY (Infosys Limited) is trading at ₹1,500.50"),
+    ("last traded price of HDFC Bank", "HDFCBANK (HDFC Bank Limited) is trading at ₹1,650.00"),
+    ("Tech Mahindra share price", "TECHM (Tech Mahindra Limited) is trading at ₹1,450.00"),
+    ("Who are the top 2 gainers today?", "Top 2 Gainers: INFY (+1.20%), HDFCBANK (+0.40%)"),
+])
+def test_answers_simple_questions(query, expected):
+    assert fast_path.try_fast_path(query).startswith(expected)
+
+def test_generic_words_are_not_aliases():
+    index = fast_path.SymbolIndex(RECORDS)
+    assert index.match("how are tech and coal stocks doing") == []
+    assert sorted(index.match("Coal India vs Tech Mahindra")) == ["COALINDIA", "TECHM"]
@@ -0,0 +1,10 @@
+import os
+from benchmarks.import_time import measure
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+
+def test_main_imports_within_budget():
+    best_ms, loaded, slowest = measure(runs=3)
+    assert not loaded, f"deferred modules loaded at import: {', '.join(loaded)}"
+    assert best_ms <= IMPORT_TIME_BUDGET_MS, (
+        f"import main took {best_ms:.0f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms); slowest: {slowest[:5]}")
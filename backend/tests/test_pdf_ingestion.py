@@ -0,0 +1,62 @@
+import hashlib
+import os
+import mongomock
+import pytest
+from src import database, pdf_ingestion
+
+class NoSymbols:
+    records = {}
+
+    def match(self, text):
+        return []
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    """Chroma stand-in: {chunk id: content hash}; PDFs are text files parsed as one chunk."""
+    chunks = {}
+    monkeypatch.setattr(database, "db", mongomock.MongoClient().db)
+    monkeypatch.setattr(pdf_ingestion, "PDF_WORKERS", 1)
+    monkeypatch.setattr(pdf_ingestion, "get_symbol_index", NoSymbols)
+    monkeypatch.setattr(pdf_ingestion, "parse_pdf", lambda path: (path, [(1, open(path).read())], None))
+    monkeypatch.setattr(pdf_ingestion, "embed_documents", lambda docs: [None] * len(docs))
+    monkeypatch.setattr(pdf_ingestion, "add_documents", lambda docs, ids, vectors: chunks.update(
+        {i: doc.metadata["content_hash"] for i, doc in zip(ids, docs)}))
+
+    def delete_documents(where):
+        for key in [k for k, h in chunks.items() if h == where["content_hash"]]:
+            del chunks[key]
+    monkeypatch.setattr(pdf_ingestion, "delete_documents", delete_documents)
+    return chunks
+
+def write(directory, name, text, mtime):
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write(text)
+    os.utime(path, (mtime, mtime))
+
+def test_copies_edits_and_reverts(store, tmp_path):
+    directory = str(tmp_path)
+    x = hashlib.sha256(b"X").hexdigest()
+
+    write(directory, "a.pdf", "X", 1)
+    write(directory, "b.pdf", "X", 1)
+    assert pdf_ingestion.ingest_pdfs(directory)["files_new"] == 1
+    # Each copy is recorded under its own path, so neither is rehashed next run
+    assert pdf_ingestion.find_new_files(directory) == ([], [], 2)
+
+    # a.pdf edited in place: X is still in b.pdf, so its chunks stay
+    write(directory, "a.pdf", "Y", 2)
+    pdf_ingestion.ingest_pdfs(directory)
+    assert x in store.values()
+    assert pdf_ingestion.find_new_files(directory) == ([], [], 2)
+
+    # b.pdf edited too: nothing holds X any more, its chunks and record go
+    write(directory, "b.pdf", "Z", 3)
+    pdf_ingestion.ingest_pdfs(directory)
+    assert x not in store.values()
+    assert not database.is_content_ingested(x)
+
+    # Reverting a.pdf to X ingests it again instead of skipping it as known
+    write(directory, "a.pdf", "X", 4)
+    assert pdf_ingestion.ingest_pdfs(directory)["files_new"] == 1
+    assert x in store.values()
@@ -1,13 +1,102 @@
+import json
+import threading
+import time
+import uuid
 import streamlit as st
 import requests
 
+MARKET_FEED_URL = "ws://localhost:8000/ws/market"
+
+def iter_sse(response):
+    """Yields (event, data) pairs from a Server-Sent Events response."""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+class LiveMarket:
+    """
+    Nifty 50 table kept current by the backend's /ws/market feed (full snapshot, then changed rows).
+    One connection per Streamlit server, read by every session; reconnects if the backend restarts.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.rows = {}
+        self.version = None
+        self.error = None
+        self._lock = threading.Lock()
+        threading.Thread(target=self._listen, daemon=True).start()
+
+    def _listen(self):
+        from websockets.sync.client import connect
+        while True:
+            try:
+                with connect(self.url) as ws:
+                    self.error = None
+                    for message in ws:
+                        self._apply(json.loads(message))
+            except Exception as e:
+                self.error = str(e) or type(e).__name__
+            time.sleep(5)
+
+    def _apply(self, message):
+        with self._lock:
+            if message["type"] == "snapshot":
+                self.rows = {}
+            for row in message["rows"]:
+                self.rows[row[0]] = row
+            for symbol in message.get("removed", []):
+                self.rows.pop(symbol, None)
+            self.version = message["version"]
+
+    def table(self):
+        with self._lock:
+            return [
+                {"Symbol": symbol, "LTP": ltp, "%CHNG": pchange, "Volume": volume}
+                for symbol, ltp, pchange, volume in self.rows.values()
+            ]
+
+@st.cache_resource
+def get_live_market():
+    return LiveMarket(MARKET_FEED_URL)
+
+@st.fragment(run_every=2)
+def live_market_table():
+    """Redraws only the table from the feed's current rows; no backend request per refresh."""
+    market = get_live_market()
+    rows = market.table()
+    if rows:
+        st.dataframe(rows, hide_index=True)
+        st.caption(f"Snapshot version {market.version}")
+    elif market.error:
+        st.caption(f"Live prices unavailable: {market.error}")
+    else:
+        st.caption("Waiting for market data...")
+
 # Page Config
 st.set_page_config(page_title="Nifty 50 RAG Bot", page_icon="📈")
 st.title("📈 Nifty 50 AI Analyst")
 
-# Initialize Chat History
+# Initialize Chat History (the backend keeps the conversation under session_id, so follow-ups have context)
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+
+if st.sidebar.button("New conversation"):
+    st.session_state.messages = []
+    st.session_state.session_id = str(uuid.uuid4())
+
+# Live prices come from the WebSocket feed, so "what's the price of X" needs no chat round trip
+with st.expander("📊 Live Nifty 50"):
+    live_market_table()
 
 # Display Chat History
 for message in st.session_state.messages:
@@ -21,22 +110,42 @@ if prompt := st.chat_input("Ask about Nifty 50 stocks..."):
         st.markdown(prompt)
     st.session_state.messages.append({"role": "user", "content": prompt})
 
-    # 2. Call Backend API
+    # 2. Call Backend API (streamed, so the answer renders as it arrives)
     with st.chat_message("assistant"):
-        with st.spinner("Analyzing market data..."):
-            try:
-                response = requests.post(
-                    "http://localhost:8000/chat", 
-                    json={"query": prompt}
-                )
-                if response.status_code == 200:
-                    answer = response.json().get("answer", "No answer received.")
-                else:
+        status = st.empty()
+        placeholder = st.empty()
+        answer = ""
+        try:
+            status.caption("Analyzing market data...")
+            with requests.post(
+                "http://localhost:8000/chat/stream",
+                json={"query": prompt, "session_id": st.session_state.session_id},
+                stream=True,
+                timeout=120,
+            ) as response:
+                if response.status_code != 200:
                     answer = f"Error: {response.text}"
-            except Exception as e:
-                answer = f"Connection Error: {e}"
+                else:
+                    for event, data in iter_sse(response):
+                        if event == "token":
+                            answer += data["text"]
+                            placeholder.markdown(answer + "▌")
+                        elif event == "tool_start":
+                            # Text before a tool call is the model thinking aloud; the server drops it too
+                            answer = ""
+                            placeholder.empty()
+                            status.caption(f"Running tool: {data['tool']}...")
+                        elif event == "tool_end":
+                            status.caption(f"Finished tool: {data['tool']}")
+                        elif event == "error":
+                            answer += f"\n\nError: {data['detail']}"
+                    if not answer:
+                        answer = "No answer received."
+        except Exception as e:
+            answer = f"Connection Error: {e}"
         
-        st.markdown(answer)
+        status.empty()
+        placeholder.markdown(answer)
     
     # 3. Add Assistant Message to History
     st.session_state.messages.append({"role": "assistant", "content": answer})
\ No newline at end of file